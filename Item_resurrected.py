@@ -9,20 +9,146 @@ Date: 2024-12-26
 
 """
 import os
+import sys
 import json
+import time
+import datetime
+import queue
+import bisect
+import hashlib
+import itertools
+import threading
+import multiprocessing
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from tkinter import messagebox, simpledialog, ttk
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 0. 定义 JSON-lines 编解码器，所有 JSON-lines 数据文件都通过它读写
+class JsonLinesCodec:
+    """JSON-lines 文件的读写层
+
+    安装了 orjson 时默认使用 orjson，否则使用标准库 json，两者写出的文件可以互相读取。
+    写入时先把所有记录编码到一个缓冲区再一次写入文件；读取时按 CHUNK_SIZE 字节分块读取，
+    逐块拆行解析，不会逐行调用 readline。
+    """
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, backend=None):
+        if backend is None:
+            backend = "orjson" if orjson is not None else "json"
+        if backend == "orjson":
+            if orjson is None:
+                raise ValueError("没有安装 orjson")
+            self.dumps = orjson.dumps
+            self.loads = orjson.loads
+            self._text = False
+        elif backend == "json":
+            self.dumps = lambda record: json.dumps(record, ensure_ascii=False).encode("utf-8")
+            self.loads = json.loads
+            # 标准库 json 处理 str 比处理 bytes 快，整块编码、解码一次，逐条只做 JSON 转换
+            self._text = True
+        else:
+            raise ValueError(f"未知的 JSON 后端: {backend}")
+        self.backend = backend
+
+    @staticmethod
+    def available_backends():
+        """返回当前环境可用的后端"""
+        return ["orjson", "json"] if orjson is not None else ["json"]
+
+    def encode(self, records):
+        """把记录编码为 JSON-lines 字节串"""
+        if self._text:
+            encoder = json.JSONEncoder(ensure_ascii=False).encode
+            return "".join([encoder(record) + "\n" for record in records]).encode("utf-8")
+        dumps = self.dumps
+        return b"".join([dumps(record) + b"\n" for record in records])
+
+    def write(self, path, records, append=False, fsync=False):
+        """把记录一次性写入文件；append 为 True 时追加到文件末尾"""
+        data = self.encode(records)
+        with open(path, "ab" if append else "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read_chunks(self, path, stop_on_error=False):
+        """按块读取文件，每次产出一块中解析出的记录列表
+
+        stop_on_error 为 True 时遇到无法解析的行就停止，用于读取可能写到一半的日志文件。
+        """
+        if not os.path.exists(path):
+            return
+        loads = self.loads
+        rest = b""
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()
+                if self._text:
+                    # 只在换行处切开，不会截断多字节字符
+                    lines = b"\n".join(lines).decode("utf-8").split("\n")
+                records, ok = self._parse(lines, loads, stop_on_error)
+                if records:
+                    yield records
+                if not ok:
+                    return
+        if rest.strip():
+            records, _ = self._parse([rest], loads, stop_on_error)
+            if records:
+                yield records
+
+    @staticmethod
+    def _parse(lines, loads, stop_on_error):
+        """解析一组行，返回 (记录列表, 是否可以继续读取)"""
+        if not stop_on_error:
+            return [loads(line) for line in lines if line.strip()], True
+        records = []
+        for line in lines:
+            if line.strip():
+                try:
+                    records.append(loads(line))
+                except ValueError:
+                    return records, False
+        return records, True
+
+    def read(self, path, stop_on_error=False):
+        """读取文件中的全部记录"""
+        return [record for records in self.read_chunks(path, stop_on_error) for record in records]
+
+
+# 全局编解码器，默认使用可用的最快后端
+codec = JsonLinesCodec()
 
 # 1. 定义 User 类
 class User:
     # 静态变量，用于生成用户ID，起始为100000000
     current_id = 100000000
+    # 规范化的邮箱/电话 -> 用户，用于 O(1) 的唯一性检查和登录查找
+    email_index = {}
+    phone_index = {}
 
-    def __init__(self, name, address, phone, email, user_id=None, password="user123", role="user", is_verified=False):
-        # 如果没有提供user_id，则自动分配一个新的ID
+    def __init__(self, name, address, phone, email, user_id=None, password="user123", role="user", is_verified=False,
+                 registered_at=None):
+        # 如果没有提供user_id，则自动分配一个新的ID，并记录注册时间
         if user_id is None:
             self.user_id = User.current_id
             User.current_id += 1  # 每创建一个用户，ID增加
+            if registered_at is None:
+                registered_at = time.time()
         else:
             self.user_id = user_id
             # 确保current_id更新到下一个未使用的ID
@@ -35,6 +161,8 @@ class User:
         self.password = password
         self.role = role  # 'user' 或 'admin'
         self.is_verified = is_verified
+        # 注册时间（Unix 时间戳），旧文件中的用户没有记录，为 None
+        self.registered_at = registered_at
 
     def register(self):
         """返回用户的注册信息"""
@@ -46,7 +174,8 @@ class User:
             'email': self.email,
             'password': self.password,
             'role': self.role,
-            'is_verified': self.is_verified
+            'is_verified': self.is_verified,
+            'registered_at': self.registered_at
         }
 
     def verify(self):
@@ -61,47 +190,159 @@ class User:
         """检查密码是否匹配"""
         return self.password == password
 
+    @staticmethod
+    def normalize_email(email):
+        """邮箱不区分大小写，忽略首尾空白"""
+        return email.strip().lower()
+
+    @staticmethod
+    def normalize_phone(phone):
+        """电话只保留数字，忽略空格和连字符等分隔符"""
+        return "".join(ch for ch in phone if ch.isdigit())
+
+    @staticmethod
+    def index_user(user):
+        """把用户加入邮箱和电话索引，已被其他用户占用的不覆盖
+
+        规范化后为空的值（例如不含数字的电话 "n/a"）无法标识用户，不加入索引。
+        """
+        for index, key in ((User.email_index, User.normalize_email(user.email)),
+                           (User.phone_index, User.normalize_phone(user.phone))):
+            if key:
+                index.setdefault(key, user)
+
+    @staticmethod
+    def unindex_user(user):
+        """把用户从邮箱和电话索引中移除"""
+        for index, key in ((User.email_index, User.normalize_email(user.email)),
+                           (User.phone_index, User.normalize_phone(user.phone))):
+            if index.get(key) is user:
+                del index[key]
+
+    @staticmethod
+    def check_unique(email, phone, exclude=None):
+        """检查邮箱和电话是否已被 exclude 以外的用户使用，已被使用时抛出 ValueError
+
+        规范化后为空的值不参与检查。
+        """
+        owner = User.email_index.get(User.normalize_email(email) or None)
+        if owner is not None and owner is not exclude:
+            raise ValueError(f"邮箱 '{email}' 已被注册。")
+        owner = User.phone_index.get(User.normalize_phone(phone) or None)
+        if owner is not None and owner is not exclude:
+            raise ValueError(f"电话 '{phone}' 已被注册。")
+
+    @staticmethod
+    def find_by_login(identifier, users):
+        """按用户ID、电话或邮箱查找用户，找不到时返回 None"""
+        identifier = identifier.strip()
+        if identifier.isdigit() and int(identifier) in users:
+            return users[int(identifier)]
+        if "@" in identifier:
+            return User.email_index.get(User.normalize_email(identifier))
+        phone = User.normalize_phone(identifier)
+        return User.phone_index.get(phone) if phone else None
+
+    def update_contact(self, email=None, phone=None):
+        """修改邮箱或电话，新值已被其他用户使用时抛出 ValueError"""
+        email = self.email if email is None else email
+        phone = self.phone if phone is None else phone
+        User.check_unique(email, phone, exclude=self)
+        User.unindex_user(self)
+        self.email = email
+        self.phone = phone
+        User.index_user(self)
+
     def save_to_file(self):
         """保存用户信息到文件"""
-        user_info = self.register()
-        with open("users_info.txt", "a", encoding='utf-8') as f:
-            f.write(json.dumps(user_info, ensure_ascii=False) + "\n")
+        codec.write("users_info.txt", [self.register()], append=True)
+
+    @staticmethod
+    def save_users(records):
+        """用 register() 生成的记录覆盖写入用户文件"""
+        codec.write("users_info.txt", records)
 
     @staticmethod
     def load_users():
-        """从文件加载用户信息"""
+        """从文件加载用户信息，并重建邮箱和电话索引"""
         users = {}
-        if os.path.exists("users_info.txt"):
-            with open("users_info.txt", "r", encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        user_info = json.loads(line.strip())
-                        if user_info['role'] == 'admin':
-                            user = Admin(
-                                user_id=user_info['user_id'],
-                                name=user_info['name'],
-                                address=user_info['address'],
-                                phone=user_info['phone'],
-                                email=user_info['email'],
-                                password=user_info['password']
-                            )
-                        else:
-                            user = User(
-                                name=user_info['name'],
-                                address=user_info['address'],
-                                phone=user_info['phone'],
-                                email=user_info['email'],
-                                user_id=user_info['user_id'],
-                                password=user_info['password'],
-                                role=user_info['role'],
-                                is_verified=user_info['is_verified']
-                            )
-                        users[user.user_id] = user
-                        # 更新current_id确保唯一性
-                        if user.user_id >= User.current_id:
-                            User.current_id = user.user_id + 1
+        User.email_index = {}
+        User.phone_index = {}
+        UserStats.reset()
+        for records in codec.read_chunks("users_info.txt"):
+            for user_info in records:
+                # 按位置传参，加载大量用户时比关键字参数快
+                if user_info['role'] == 'admin':
+                    user = Admin(user_info['user_id'], user_info['name'], user_info['address'],
+                                 user_info['phone'], user_info['email'], user_info['password'])
+                else:
+                    user = User(user_info['name'], user_info['address'], user_info['phone'], user_info['email'],
+                                user_info['user_id'], user_info['password'], user_info['role'], user_info['is_verified'],
+                                user_info.get('registered_at'))
+                users[user.user_id] = user
+                User.index_user(user)
+                UserStats.add(user)
+                # 更新current_id确保唯一性
+                if user.user_id >= User.current_id:
+                    User.current_id = user.user_id + 1
         return users
 
+    @staticmethod
+    def find_duplicates(path="users_info.txt"):
+        """找出文件中邮箱或电话重复的用户
+
+        返回 {"email": {规范化邮箱: [用户ID, ...]}, "phone": {规范化电话: [用户ID, ...]}}，
+        只包含被两个及以上用户使用的值；规范化后为空的值不算重复。
+        """
+        groups = {"email": {}, "phone": {}}
+        for records in codec.read_chunks(path):
+            for user_info in records:
+                groups["email"].setdefault(User.normalize_email(user_info['email']), []).append(user_info['user_id'])
+                groups["phone"].setdefault(User.normalize_phone(user_info['phone']), []).append(user_info['user_id'])
+        return {field: {key: ids for key, ids in values.items() if key and len(ids) > 1}
+                for field, values in groups.items()}
+
+
+class UserStats:
+    """增量维护的用户计数
+
+    加载、注册和审核用户时更新，统计面板读取计数时不需要遍历用户。
+    """
+    total = 0
+    # 尚未审核的普通用户数量
+    pending = 0
+    # 注册日期（date.toordinal()）-> 当天注册的用户数量
+    registrations_by_day = {}
+
+    @staticmethod
+    def reset():
+        """清空计数，重新加载用户前调用"""
+        UserStats.total = 0
+        UserStats.pending = 0
+        UserStats.registrations_by_day = {}
+
+    @staticmethod
+    def add(user):
+        """加载或注册了一个用户"""
+        UserStats.total += 1
+        if not user.is_verified and user.role != "admin":
+            UserStats.pending += 1
+        if user.registered_at is not None:
+            day = datetime.date.fromtimestamp(user.registered_at).toordinal()
+            UserStats.registrations_by_day[day] = UserStats.registrations_by_day.get(day, 0) + 1
+
+    @staticmethod
+    def verified(user):
+        """用户通过了审核"""
+        if user.role != "admin":
+            UserStats.pending -= 1
+
+    @staticmethod
+    def registrations(days):
+        """返回包括今天在内最近 days 天的注册人数"""
+        today = datetime.date.today().toordinal()
+        return sum(UserStats.registrations_by_day.get(today - offset, 0) for offset in range(days))
+
 # 2. 定义 Admin 类，继承 User 类
 class Admin(User):
     def __init__(self, user_id, name, address, phone, email, password="admin123"):
@@ -112,9 +353,17 @@ class Admin(User):
         """管理员新增物品类型"""
         ItemCategory.add_category(type_name, attributes)
 
-    def delete_item_type(self, type_name):
-        """管理员删除物品类型"""
-        ItemCategory.delete_category(type_name)
+    def delete_item_type(self, type_name, reassign_to=None):
+        """管理员删除物品类型，类型下的物品改为 reassign_to 类型"""
+        return ItemCategory.delete_category(type_name, reassign_to)
+
+    def rename_item_type(self, type_name, new_name):
+        """管理员重命名物品类型"""
+        return ItemCategory.rename_category(type_name, new_name)
+
+    def merge_item_type(self, type_name, target):
+        """管理员把物品类型合并到另一个类型"""
+        return ItemCategory.merge_category(type_name, target)
 
     def modify_item_type(self, type_name, attributes):
         """管理员修改物品类型"""
@@ -129,6 +378,8 @@ class Admin(User):
         if user.is_verified:
             return f"用户 {user.name} 已审核通过。"
         user.verify()
+        UserStats.verified(user)
+        events.publish(UserVerified(user))
         return f"用户 {user.name} 已审核通过。"
 
     def reset_user_password(self, user, new_password):
@@ -136,70 +387,523 @@ class Admin(User):
         user.set_password(new_password)
         return f"用户 {user.name} 的密码已重置为 '{new_password}'。"
 
-# 3. 定义 Item 和 ItemCategory 类
+# 3. 定义 Item、ItemCategory 和物品分片存储类
 class Item:
+    # 静态变量，用于生成物品ID，起始为1
+    current_id = 1
     items = []
+    # 物品ID -> 物品，供类别索引按ID找到物品
+    items_by_id = {}
+    # 所有者ID -> 该用户已加载到内存的物品ID集合
+    owner_items = {}
+    # 物品列表可能同时被主线程和后台线程访问，修改和快照都需持有该锁
+    lock = threading.RLock()
+    # 搜索时每扫描这么多个物品检查一次取消标记并汇报进度
+    SCAN_CHUNK = 5000
+    # 建立并行搜索的共享内存快照后增删改过的物品ID，下次并行搜索时增量应用到快照；
+    # 还没有快照时为 None，不需要记录
+    changed_ids = None
+
+    # 待搜索的物品达到这个数量时使用多进程并行搜索，否则在当前线程中顺序扫描
+    PARALLEL_SEARCH_THRESHOLD = 200000
+    # 并行搜索的进程数，默认为 CPU 核数
+    SEARCH_PROCESSES = os.cpu_count() or 1
+    search_pool = None
+    search_snapshot = None
+    # 同一时间只进行一次并行搜索，避免快照在使用中被替换
+    search_snapshot_lock = threading.Lock()
+    # 搜索结果缓存，在 SearchCache 定义后初始化；物品在内存中变化时立即失效
+    search_cache = None
+    # 缓存的搜索条件数量上限和有效期（秒）
+    SEARCH_CACHE_SIZE = 256
+    SEARCH_CACHE_TTL = 300
+
+    # 分片目录：其中存在 manifest.json 时按类别分片存储，否则使用单个 items.txt
+    SHARD_DIR = "items_data"
+    # 分片在这么多秒内没有被访问就可以从内存中移除
+    SHARD_IDLE_SECONDS = 300
+    store = None
+    # 已加载的分片：类别名称 -> 最后访问时间
+    loaded_shards = {}
+    # 用户ID -> 用户，延迟加载分片时用来找到物品的所有者
+    owners = {}
+    # 串行化分片的加载、追加和移除，避免同一个分片被重复加载
+    shard_lock = threading.RLock()
+
+    # 使用单个 items.txt 时，增删改先写入预写日志，日志积累到 WAL_COMPACT_THRESHOLD 条
+    # 或关闭程序时才合并回 items.txt，不再每次修改都重写整个文件
+    WAL_PATH = "items.wal"
+    WAL_COMPACT_THRESHOLD = 10000
+    # 组提交：上一批写入期间到达的记录（最多 WAL_MAX_BATCH 条）合并为一批，统一 fsync 一次
+    WAL_MAX_BATCH = 256
+    wal = None
 
     @classmethod
     def load_items(cls, users):
-        """从文件加载物品信息"""
-        if os.path.exists("items.txt"):
-            with open("items.txt", "r", encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        item_info = json.loads(line.strip())
-                        owner_id = item_info['owner_id']
-                        owner = users.get(owner_id)
-                        if owner:
-                            item = Item(
-                                name=item_info['name'],
-                                description=item_info['description'],
-                                category=item_info['category'],
-                                owner=owner
-                            )
-                            cls.items.append(item)
+        """从文件加载物品信息；使用分片目录时只读取清单，分片在第一次访问时加载"""
+        cls.owners = users
+        if ShardedItemStore.exists(cls.SHARD_DIR):
+            cls.store = ShardedItemStore(cls.SHARD_DIR)
+            with cls.lock:
+                cls.current_id = max(cls.current_id, cls.store.manifest["next_item_id"])
+                # 分片尚未加载，计数从清单中记录的各分片所有者物品数量得到
+                ItemStats.load_shards(cls.store.manifest, cls.store.owner_counts())
+            return
+        for records in codec.read_chunks("items.txt"):
+            items = [item for item in map(cls._from_record, records) if item is not None]
+            # 每块只获取一次锁
+            with cls.lock:
+                for item in items:
+                    cls._register(item)
+                    ItemStats.count(item, 1)
+        # 重放已确认但尚未合并到 items.txt 的修改
+        for record in WriteAheadLog.read(cls.WAL_PATH):
+            cls._replay(record)
+        cls.wal = WriteAheadLog(cls.WAL_PATH, cls.WAL_MAX_BATCH)
 
     @classmethod
-    def save_items(cls):
-        """将所有物品信息保存到文件"""
-        with open("items.txt", "w", encoding='utf-8') as f:
-            for item in cls.items:
-                item_info = {
-                    'name': item.name,
-                    'description': item.description,
-                    'category': item.category,
-                    'owner_id': item.owner.user_id
-                }
-                f.write(json.dumps(item_info, ensure_ascii=False) + "\n")
+    def _replay(cls, record):
+        """把一条预写日志记录应用到内存中的物品，重复应用的结果相同"""
+        with cls.lock:
+            current = cls.items_by_id.get(record.get("item_id"))
+            if record["op"] == "add":
+                if current is None:
+                    item = cls._from_record(record["item"])
+                    if item:
+                        cls._register(item)
+                        ItemStats.count(item, 1)
+            elif record["op"] == "modify":
+                if current is not None:
+                    ItemCategory.unindex_item(current)
+                    ItemStats.count(current, -1)
+                    for field in ("name", "description", "category"):
+                        if field in record:
+                            setattr(current, field, record[field])
+                    ItemCategory.index_item(current)
+                    ItemStats.count(current, 1)
+                    cls._mark_changed(current.item_id)
+            elif record["op"] == "delete":
+                if current is not None:
+                    cls._unregister(current)
+                    ItemStats.count(current, -1)
 
     @classmethod
-    def add_item(cls, name, description, category, owner):
+    def _log(cls, record):
+        """把修改写入预写日志，返回日志落盘后完成的 Future；调用时需持有 cls.lock 以保证日志顺序"""
+        if cls.wal is None:
+            cls.wal = WriteAheadLog(cls.WAL_PATH, cls.WAL_MAX_BATCH)
+        return cls.wal.append(record)
+
+    @classmethod
+    def _commit(cls, ack, result, wait=True):
+        """日志过长时先合并到 items.txt，然后等待日志落盘后返回 result
+
+        wait 为 False 时不等待，返回日志落盘后以 result 完成的 Future，
+        调用线程可以继续提交其他修改，让它们在同一次 fsync 中落盘。
+        """
+        if cls.wal.count >= cls.WAL_COMPACT_THRESHOLD:
+            cls.save_items()
+        done = Future()
+
+        def on_logged(future):
+            error = future.exception()
+            if error is not None:
+                done.set_exception(error)
+            else:
+                done.set_result(result)
+
+        ack.add_done_callback(on_logged)
+        return done.result() if wait else done
+
+    @staticmethod
+    def _completed(result, wait):
+        """不经过预写日志的修改已经保存，wait 为 False 时包装为已完成的 Future"""
+        if wait:
+            return result
+        done = Future()
+        done.set_result(result)
+        return done
+
+    @classmethod
+    def _from_record(cls, item_info):
+        """根据文件中的一行记录创建物品，所有者不存在时返回 None"""
+        owner = cls.owners.get(item_info['owner_id'])
+        if owner:
+            # 旧文件中没有 item_id，加载时自动分配；按位置传参，加载大量物品时比关键字参数快
+            return Item(item_info['name'], item_info['description'], item_info['category'],
+                        owner, item_info.get('item_id'))
+        return None
+
+    @staticmethod
+    def _to_record(item):
+        """生成物品保存到文件的记录"""
+        return {
+            'item_id': item.item_id,
+            'name': item.name,
+            'description': item.description,
+            'category': item.category,
+            'owner_id': item.owner.user_id
+        }
+
+    @classmethod
+    def save_items(cls, categories=None):
+        """将物品信息保存到文件
+
+        使用分片目录时只重写 categories 中已加载的分片（默认为所有已加载的分片），
+        否则重写整个 items.txt。
+        """
+        if cls.store is not None:
+            with cls.shard_lock:
+                for category in list(cls.loaded_shards if categories is None else categories):
+                    if category not in cls.loaded_shards:
+                        # 未加载的分片在内存中没有数据，重写会清空它
+                        continue
+                    with cls.lock:
+                        records = [cls._to_record(cls.items_by_id[item_id])
+                                   for item_id in sorted(ItemCategory.category_items.get(category, ()))]
+                    cls.store.write_shard(category, records)
+            return
+        # 只在持锁期间生成快照并轮换预写日志，写文件时不阻塞其他线程
+        with cls.lock:
+            records = [cls._to_record(item) for item in cls.items]
+            if cls.wal is not None:
+                cls.wal.rotate()
+        codec.write("items.txt.tmp", records, fsync=True)
+        os.replace("items.txt.tmp", "items.txt")
+        # 快照已经包含轮换出去的日志中的所有修改
+        WriteAheadLog.remove_rotated(cls.WAL_PATH)
+
+    @classmethod
+    def close_wal(cls):
+        """停止预写日志的提交线程"""
+        if cls.wal is not None:
+            cls.wal.close()
+            cls.wal = None
+
+    @classmethod
+    def add_item(cls, name, description, category, owner, wait=True):
+        """添加物品；wait 为 False 时不等待预写日志落盘，返回落盘后以新物品完成的 Future"""
         new_item = Item(name, description, category, owner)
-        cls.items.append(new_item)
-        cls.save_items()
+        ack = None
+        if cls.store is None:
+            with cls.lock:
+                cls._register(new_item)
+                ItemStats.count(new_item, 1)
+                cls._invalidate_search(category)
+                ack = cls._log({"op": "add", "item_id": new_item.item_id, "item": cls._to_record(new_item)})
+        else:
+            # 分片存储只需把新物品追加到所属分片；先加载该分片再登记新物品，
+            # 返回和发布的就是内存中的物品对象，之后的修改和删除都能找到它
+            with cls.shard_lock:
+                cls.ensure_loaded([category])
+                with cls.lock:
+                    cls._register(new_item)
+                    ItemStats.count(new_item, 1)
+                    cls._invalidate_search(category)
+                cls.store.append(cls._to_record(new_item))
+        # 内存中已经有了新物品，不必等日志落盘再通知打开的窗口
+        events.publish(ItemAdded(new_item))
+        if ack is None:
+            return cls._completed(new_item, wait)
+        return cls._commit(ack, new_item, wait)
 
     @classmethod
-    def search_item(cls, category, keyword):
-        """根据类别和关键字搜索物品"""
-        return [item for item in cls.items if category in item.category and (keyword.lower() in item.name.lower() or keyword.lower() in item.description.lower())]
+    def _register(cls, item):
+        """把物品加入物品列表、ID索引、所有者索引和类别索引"""
+        with cls.lock:
+            cls.items.append(item)
+            cls.items_by_id[item.item_id] = item
+            cls.owner_items.setdefault(item.owner.user_id, set()).add(item.item_id)
+            ItemCategory.index_item(item)
+            cls._mark_changed(item.item_id)
 
     @classmethod
-    def delete_item(cls, item):
-        """删除物品"""
-        if item in cls.items:
-            cls.items.remove(item)
-            cls.save_items()
-            return f"物品 '{item.name}' 已删除。"
-        return f"物品 '{item.name}' 不存在。"
+    def _unregister(cls, item):
+        """把物品从物品列表和各个索引中移除，调用时需持有 cls.lock"""
+        del cls.items_by_id[item.item_id]
+        cls.items.remove(item)
+        cls.owner_items.get(item.owner.user_id, set()).discard(item.item_id)
+        ItemCategory.unindex_item(item)
+        cls._mark_changed(item.item_id)
+
+    @classmethod
+    def _invalidate_search(cls, *categories):
+        """物品在内存中变化时立即让相关类别的搜索缓存失效，调用时需持有 cls.lock
+
+        不能等到日志落盘或事件发布之后再失效，否则这段时间内的搜索会读到旧的缓存结果。
+        """
+        if cls.search_cache is not None:
+            cls.search_cache.invalidate(*categories)
+
+    @classmethod
+    def _mark_changed(cls, item_id):
+        """记录物品被增删改，调用时需持有 cls.lock"""
+        if cls.changed_ids is not None:
+            cls.changed_ids.add(item_id)
+
+    @classmethod
+    def ensure_loaded(cls, categories):
+        """确保这些类别的分片已加载到内存并刷新访问时间；未使用分片目录时什么都不做"""
+        if cls.store is None:
+            return
+        with cls.shard_lock:
+            for category in categories:
+                if category not in cls.loaded_shards:
+                    for record in cls.store.read_shard(category):
+                        item = cls._from_record(record)
+                        if item:
+                            cls._register(item)
+                cls.loaded_shards[category] = time.monotonic()
+
+    @classmethod
+    def evict_cold_shards(cls, idle_seconds=None):
+        """把超过 idle_seconds 秒未被访问的分片移出内存，返回移除的分片数量
+
+        每次修改都会立即写入分片文件，所以被移除的分片没有未保存的改动。
+        """
+        if cls.store is None:
+            return 0
+        if idle_seconds is None:
+            idle_seconds = cls.SHARD_IDLE_SECONDS
+        now = time.monotonic()
+        with cls.shard_lock, cls.lock:
+            cold = [category for category, last_access in cls.loaded_shards.items() if now - last_access >= idle_seconds]
+            evicted_ids = set()
+            for category in cold:
+                del cls.loaded_shards[category]
+                evicted_ids |= ItemCategory.category_items.pop(category, set())
+            if evicted_ids:
+                for item_id in evicted_ids:
+                    item = cls.items_by_id.pop(item_id)
+                    cls.owner_items.get(item.owner.user_id, set()).discard(item_id)
+                    cls._mark_changed(item_id)
+                cls.items = [item for item in cls.items if item.item_id not in evicted_ids]
+        return len(cold)
+
+    @classmethod
+    def all_items(cls):
+        """返回全部物品，使用分片目录时会先加载所有分片"""
+        if cls.store is not None:
+            cls.ensure_loaded(cls.store.categories())
+        with cls.lock:
+            return list(cls.items)
+
+    @classmethod
+    def items_of_owner(cls, owner_id):
+        """返回某个用户的全部物品，使用分片目录时只加载该用户有物品的分片"""
+        if cls.store is not None:
+            cls.ensure_loaded(cls.store.categories_for_owner(owner_id))
+        with cls.lock:
+            return [cls.items_by_id[item_id] for item_id in sorted(cls.owner_items.get(owner_id, ()))]
+
+    @classmethod
+    def count_in_category(cls, category):
+        """返回类别下的物品数量，包括尚未加载的分片中的物品"""
+        with cls.lock:
+            return ItemStats.by_category.get(category, 0)
+
+    @classmethod
+    def search_item(cls, category, keyword, task=None, parallel=None):
+        """根据类别和关键字搜索物品
+
+        task 为后台任务句柄时，每扫描 SCAN_CHUNK 个物品检查一次取消并汇报进度。
+        使用分片目录时只加载名称包含 category 的类别分片。
+        parallel 为 None 时，物品数量达到 PARALLEL_SEARCH_THRESHOLD 才使用多进程搜索。
+        """
+        category, keyword = SearchCache.normalize(category, keyword)
+        cache = cls.search_cache
+        if cache is not None:
+            cached = cache.get(category, keyword)
+            if cached is not None:
+                return cached
+            generation = cache.generation
+        if cls.store is not None:
+            cls.ensure_loaded([name for name in cls.store.categories() if category in name])
+        with cls.lock:
+            items = list(cls.items)
+        if parallel is None:
+            parallel = cls.SEARCH_PROCESSES > 1 and len(items) >= cls.PARALLEL_SEARCH_THRESHOLD
+        results = cls._parallel_search(category, keyword, task) if parallel else None
+        if results is None:
+            results = cls._serial_search(items, category, keyword, task)
+        if cache is not None:
+            cache.put(category, keyword, results, generation)
+        return results
+
+    @classmethod
+    def _serial_search(cls, items, category, keyword, task=None):
+        """在当前线程中逐个扫描物品"""
+        total = len(items)
+        results = []
+        for start in range(0, total, cls.SCAN_CHUNK):
+            if task is not None:
+                task.check_cancelled()
+                task.report_progress(start, total)
+            results.extend(item for item in items[start:start + cls.SCAN_CHUNK]
+                           if category in item.category and (keyword in item.name.lower() or keyword in item.description.lower()))
+        return results
+
+    @classmethod
+    def _parallel_search(cls, category, keyword, task=None):
+        """把物品分块交给进程池扫描
+
+        物品文本编码后放入共享内存，子进程直接读取共享内存，不需要序列化物品对象。
+        快照建立后的增删改只记录在快照的补丁中，由主进程顺序扫描；补丁过大时才重新建立快照。
+        进程池损坏时返回 None，由调用方改为顺序扫描。
+        """
+        with cls.search_snapshot_lock:
+            with cls.lock:
+                snapshot = cls.search_snapshot
+                if snapshot is not None:
+                    snapshot.apply({item_id: cls.items_by_id.get(item_id) for item_id in cls.changed_ids})
+                    cls.changed_ids = set()
+                items = list(cls.items) if snapshot is None or snapshot.needs_rebuild() else None
+                if items is not None:
+                    # 从此刻开始记录变化，建立快照期间的修改会在下次搜索时应用
+                    cls.changed_ids = set()
+            if items is not None:
+                if snapshot is not None:
+                    snapshot.close()
+                snapshot = cls.search_snapshot = SearchSnapshot(items)
+            if cls.search_pool is None:
+                # 使用 spawn 避免在带有 Tk 和多个线程的进程中 fork
+                cls.search_pool = ProcessPoolExecutor(max_workers=cls.SEARCH_PROCESSES,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+            total = len(snapshot.items)
+            chunk_size = max(1, -(-total // (cls.SEARCH_PROCESSES * 4)))
+            futures = []
+            matches = []
+            try:
+                for start in range(0, total, chunk_size):
+                    futures.append(cls.search_pool.submit(search_chunk, snapshot.text.name, snapshot.offsets.name,
+                                                          start, min(start + chunk_size, total), category, keyword))
+                for done, future in enumerate(futures):
+                    if task is not None:
+                        task.check_cancelled()
+                        task.report_progress(done * chunk_size, total)
+                    matches.extend(future.result())
+            except TaskCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+            except BrokenProcessPool:
+                # 工作进程异常退出（例如被系统杀掉）后进程池不能再用，
+                # 丢弃它让下次搜索重新创建，本次搜索改为在当前线程中扫描
+                cls.search_pool.shutdown(wait=False, cancel_futures=True)
+                cls.search_pool = None
+                return None
+            results = [snapshot.items[index] for index in matches if index not in snapshot.tombstones]
+            results.extend(snapshot.search_patch(category, keyword))
+            return results
+
+    @classmethod
+    def shutdown_search_pool(cls):
+        """关闭并行搜索的进程池并释放共享内存"""
+        with cls.search_snapshot_lock:
+            if cls.search_pool is not None:
+                cls.search_pool.shutdown(wait=True, cancel_futures=True)
+                cls.search_pool = None
+            if cls.search_snapshot is not None:
+                cls.search_snapshot.close()
+                cls.search_snapshot = None
+            with cls.lock:
+                cls.changed_ids = None
+
+    @classmethod
+    def _load_item(cls, item):
+        """确保物品所在的分片已加载，返回内存中当前的物品对象，找不到时返回 None
+
+        调用方持有的对象可能已经过期：分片被移出内存后重新加载会生成新的对象，
+        之后重命名类别也不会修改旧对象的类别。所以只按物品ID查找，对象记录的类别
+        只用来决定先加载哪个分片，在其中找不到时再加载全部分片。
+        """
+        if cls.store is not None:
+            with cls.lock:
+                current = cls.items_by_id.get(item.item_id)
+            # 已加载时也调用 ensure_loaded，刷新分片的访问时间
+            cls.ensure_loaded([(current or item).category])
+            with cls.lock:
+                current = cls.items_by_id.get(item.item_id)
+            if current is None:
+                cls.ensure_loaded(cls.store.categories())
+        with cls.lock:
+            return cls.items_by_id.get(item.item_id)
+
+    @classmethod
+    def modify_item(cls, item, new_name, new_description, wait=True):
+        """修改物品名称和描述，返回结果说明；wait 为 False 时返回日志落盘后以结果说明完成的 Future"""
+        old_name = item.name
+        cls._load_item(item)
+        with cls.lock:
+            # 按ID找到当前的物品对象，调用方持有的对象可能已经过期
+            current = cls.items_by_id.get(item.item_id)
+            if current is None:
+                return cls._completed(f"物品 '{old_name}' 不存在。", wait)
+            for target in (item, current):
+                target.name = new_name
+                target.description = new_description
+            cls._mark_changed(current.item_id)
+            cls._invalidate_search(current.category)
+            ack = None
+            if cls.store is None:
+                ack = cls._log({"op": "modify", "item_id": current.item_id,
+                                "name": new_name, "description": new_description})
+        if ack is None:
+            cls.save_items([current.category])
+        events.publish(ItemModified(current))
+        result = f"物品 '{old_name}' 已修改为 '{new_name}'。"
+        if ack is None:
+            return cls._completed(result, wait)
+        return cls._commit(ack, result, wait)
 
-    def __init__(self, name, description, category, owner):
+    @classmethod
+    def delete_item(cls, item, wait=True):
+        """删除物品，返回结果说明；wait 为 False 时返回日志落盘后以结果说明完成的 Future"""
+        cls._load_item(item)
+        with cls.lock:
+            current = cls.items_by_id.get(item.item_id)
+            if current is None:
+                return cls._completed(f"物品 '{item.name}' 不存在。", wait)
+            cls._unregister(current)
+            ItemStats.count(current, -1)
+            cls._invalidate_search(current.category)
+            ack = None
+            if cls.store is None:
+                ack = cls._log({"op": "delete", "item_id": current.item_id})
+        if ack is None:
+            cls.save_items([current.category])
+        events.publish(ItemDeleted(current))
+        result = f"物品 '{item.name}' 已删除。"
+        if ack is None:
+            return cls._completed(result, wait)
+        return cls._commit(ack, result, wait)
+
+    def __init__(self, name, description, category, owner, item_id=None):
+        # 如果没有提供item_id，则自动分配一个新的ID
+        with Item.lock:
+            if item_id is None:
+                item_id = Item.current_id
+            # 确保current_id更新到下一个未使用的ID
+            if item_id >= Item.current_id:
+                Item.current_id = item_id + 1
+        self.item_id = item_id
         self.name = name
         self.description = description
         self.category = category
         self.owner = owner
 
 class ItemCategory:
+    # 类别名称 -> {"描述": 描述}
     categories = {}
+    # 类别名称 -> 属于该类别的物品ID集合，重命名、合并和删除类别时只需修改受影响的物品
+    category_items = {}
+
+    @staticmethod
+    def normalize(description):
+        """把类别描述统一为 {"描述": 描述} 的格式，兼容直接传入的字符串"""
+        if isinstance(description, dict):
+            return {"描述": description.get("描述", "")}
+        return {"描述": description}
 
     @staticmethod
     def load_categories():
@@ -216,75 +920,1119 @@ class ItemCategory:
     @staticmethod
     def save_categories():
         """保存所有物品类别到文件"""
+        with Item.lock:
+            lines = [f"{name},{info['描述']}\n" for name, info in ItemCategory.categories.items()]
         with open("categories.txt", "w", encoding="utf-8") as file:
-            for name, info in ItemCategory.categories.items():
-                # 确保 info 是字典，并包含 '描述' 键
-                if isinstance(info, dict) and '描述' in info:
-                    file.write(f"{name},{info['描述']}\n")
-                else:
-                    print(f"警告: 类别 {name} 的数据格式不正确")
+            file.writelines(lines)
+
+    @staticmethod
+    def save_changes(changed_categories):
+        """保存类别文件；有物品被重新归类时，把受影响类别的物品一次性写入物品文件"""
+        ItemCategory.save_categories()
+        if changed_categories:
+            Item.save_items(changed_categories)
+
+    @staticmethod
+    def index_item(item):
+        """把物品加入类别索引"""
+        ItemCategory.category_items.setdefault(item.category, set()).add(item.item_id)
+
+    @staticmethod
+    def unindex_item(item):
+        """把物品从类别索引中移除"""
+        item_ids = ItemCategory.category_items.get(item.category)
+        if item_ids is not None:
+            item_ids.discard(item.item_id)
+
+    @staticmethod
+    def items_in(name):
+        """返回属于该类别的所有物品"""
+        with Item.lock:
+            return [Item.items_by_id[item_id] for item_id in ItemCategory.category_items.get(name, ())]
+
+    @staticmethod
+    def _reassign(old_name, new_name):
+        """把 old_name 类别下的物品改为 new_name，只修改索引中记录的物品，返回被修改的物品"""
+        item_ids = ItemCategory.category_items.pop(old_name, set())
+        changed = [Item.items_by_id[item_id] for item_id in item_ids]
+        for item in changed:
+            ItemStats.count(item, -1)
+            item.category = new_name
+            ItemStats.count(item, 1)
+            Item._mark_changed(item.item_id)
+        if item_ids:
+            ItemCategory.category_items.setdefault(new_name, set()).update(item_ids)
+            Item._invalidate_search(old_name, new_name)
+        return changed
+
+    @staticmethod
+    def _publish_changes(name, action, new_name, changed_items):
+        """发布类别变化事件，以及被重新归类的物品的修改事件"""
+        for item in changed_items:
+            events.publish(ItemModified(item))
+        events.publish(CategoryChanged(name, action, new_name))
 
     @staticmethod
     def add_category(name, description, save=True):
         """添加物品类别"""
-        ItemCategory.categories[name] = description
+        with Item.lock:
+            ItemCategory.categories[name] = ItemCategory.normalize(description)
         if save:
             ItemCategory.save_categories()
-        # messagebox.showinfo("添加成功", f"物品类别 '{name}' 已添加。")
+        events.publish(CategoryChanged(name, "added"))
 
     @staticmethod
-    def delete_category(name, save=True):
-        """删除物品类别"""
-        if name in ItemCategory.categories:
+    def delete_category(name, reassign_to=None, save=True):
+        """删除物品类别，类别下的物品改为 reassign_to 类别，返回被重新归类的物品数量
+
+        类别下仍有物品但没有指定 reassign_to 时抛出 ValueError，避免留下无类别的物品。
+        """
+        Item.ensure_loaded([name] if reassign_to is None else [name, reassign_to])
+        with Item.lock:
+            if name not in ItemCategory.categories:
+                raise ValueError(f"物品类别 '{name}' 不存在。")
+            if ItemCategory.category_items.get(name):
+                if reassign_to is None:
+                    raise ValueError(f"物品类别 '{name}' 下还有物品，请指定新的类别。")
+                if reassign_to == name or reassign_to not in ItemCategory.categories:
+                    raise ValueError(f"物品类别 '{reassign_to}' 不存在。")
             del ItemCategory.categories[name]
-            if save:
-                ItemCategory.save_categories()
-            messagebox.showinfo("删除成功", f"物品类别 '{name}' 已删除。")
-        else:
-            messagebox.showerror("错误", f"物品类别 '{name}' 不存在。")
+            changed = ItemCategory._reassign(name, reassign_to) if reassign_to is not None else []
+        if save:
+            ItemCategory.save_changes([name, reassign_to] if changed else [])
+        ItemCategory._publish_changes(name, "deleted", reassign_to, changed)
+        return len(changed)
+
+    @staticmethod
+    def rename_category(name, new_name, save=True):
+        """重命名物品类别，并同步修改该类别下的物品，返回被修改的物品数量"""
+        Item.ensure_loaded([name, new_name])
+        with Item.lock:
+            if name not in ItemCategory.categories:
+                raise ValueError(f"物品类别 '{name}' 不存在。")
+            if new_name in ItemCategory.categories:
+                raise ValueError(f"物品类别 '{new_name}' 已存在。")
+            ItemCategory.categories[new_name] = ItemCategory.categories.pop(name)
+            changed = ItemCategory._reassign(name, new_name)
+        if save:
+            ItemCategory.save_changes([name, new_name] if changed else [])
+        ItemCategory._publish_changes(name, "renamed", new_name, changed)
+        return len(changed)
+
+    @staticmethod
+    def merge_category(name, target, save=True):
+        """把物品类别合并到 target 类别并删除原类别，返回被重新归类的物品数量"""
+        Item.ensure_loaded([name, target])
+        with Item.lock:
+            if name not in ItemCategory.categories:
+                raise ValueError(f"物品类别 '{name}' 不存在。")
+            if target == name or target not in ItemCategory.categories:
+                raise ValueError(f"物品类别 '{target}' 不存在。")
+            del ItemCategory.categories[name]
+            changed = ItemCategory._reassign(name, target)
+        if save:
+            ItemCategory.save_changes([name, target] if changed else [])
+        ItemCategory._publish_changes(name, "merged", target, changed)
+        return len(changed)
 
     @staticmethod
     def modify_category(name, new_description, save=True):
-        """修改物品类别"""
-        if name in ItemCategory.categories:
-            ItemCategory.categories[name] = {"描述": new_description}
-            if save:
-                ItemCategory.save_categories()
-            messagebox.showinfo("修改成功", f"物品类别 '{name}' 已修改。")
-        else:
-            messagebox.showerror("错误", f"物品类别 '{name}' 不存在。")
+        """修改物品类别的描述"""
+        with Item.lock:
+            if name not in ItemCategory.categories:
+                raise ValueError(f"物品类别 '{name}' 不存在。")
+            ItemCategory.categories[name] = ItemCategory.normalize(new_description)
+        if save:
+            ItemCategory.save_categories()
+        events.publish(CategoryChanged(name, "modified"))
 
     @staticmethod
     def get_categories():
         """获取所有物品类别"""
         return ItemCategory.categories
 
-# 4. 定义 Application 类，包含GUI逻辑
+
+class ItemStats:
+    """增量维护的物品计数
+
+    增删物品和重新归类时按变化的物品更新计数，读取计数时不需要扫描物品列表。
+    使用分片目录时计数包括尚未加载的分片中的物品，加载和移除分片不会改变计数。
+    所有方法都需在持有 Item.lock 时调用。
+    """
+    # 所有者ID -> {类别名称: 物品数量}
+    by_owner = {}
+    # 所有者ID -> 物品总数
+    owner_totals = {}
+    # 类别名称 -> 物品数量
+    by_category = {}
+    # 物品总数 -> 有这么多物品的所有者ID集合，以及从小到大排列的非零总数，
+    # 查找物品最多的用户时从最大的总数开始取，不需要遍历所有用户
+    owners_by_total = {}
+    totals = []
+
+    @staticmethod
+    def _set_total(owner_id, total):
+        """修改用户的物品总数，并把用户移到对应的分组"""
+        old = ItemStats.owner_totals.get(owner_id, 0)
+        ItemStats.owner_totals[owner_id] = total
+        if old:
+            bucket = ItemStats.owners_by_total[old]
+            bucket.discard(owner_id)
+            if not bucket:
+                del ItemStats.owners_by_total[old]
+                del ItemStats.totals[bisect.bisect_left(ItemStats.totals, old)]
+        if total:
+            if total not in ItemStats.owners_by_total:
+                ItemStats.owners_by_total[total] = set()
+                bisect.insort(ItemStats.totals, total)
+            ItemStats.owners_by_total[total].add(owner_id)
+
+    @staticmethod
+    def count(item, delta):
+        """物品被加入（delta 为 1）或移出（delta 为 -1）时更新计数"""
+        owner_id = item.owner.user_id
+        categories = ItemStats.by_owner.setdefault(owner_id, {})
+        categories[item.category] = categories.get(item.category, 0) + delta
+        if not categories[item.category]:
+            del categories[item.category]
+        ItemStats._set_total(owner_id, ItemStats.owner_totals.get(owner_id, 0) + delta)
+        ItemStats.by_category[item.category] = ItemStats.by_category.get(item.category, 0) + delta
+        if not ItemStats.by_category[item.category]:
+            del ItemStats.by_category[item.category]
+
+    @staticmethod
+    def load_shards(manifest, owner_counts):
+        """根据分片清单中的物品数量和各分片的所有者物品数量初始化计数
+
+        owner_counts 为 ShardedItemStore.owner_counts() 的返回值。
+        """
+        ItemStats.by_owner = {}
+        ItemStats.owner_totals = {}
+        ItemStats.owners_by_total = {}
+        ItemStats.totals = []
+        ItemStats.by_category = {category: info["count"] for category, info in manifest["shards"].items() if info["count"]}
+        for category, owners in owner_counts.items():
+            for owner_id, count in owners.items():
+                ItemStats.by_owner.setdefault(owner_id, {})[category] = count
+                ItemStats._set_total(owner_id, ItemStats.owner_totals.get(owner_id, 0) + count)
+
+    @staticmethod
+    def of_owner(owner_id):
+        """返回用户的物品总数和各类别的物品数量"""
+        return ItemStats.owner_totals.get(owner_id, 0), dict(ItemStats.by_owner.get(owner_id, {}))
+
+    @staticmethod
+    def top_owners(count):
+        """返回物品最多的 count 个用户的 (所有者ID, 物品数量)，物品数量相同的用户顺序不定"""
+        result = []
+        for total in reversed(ItemStats.totals):
+            if len(result) >= count:
+                break
+            result.extend((owner_id, total) for owner_id in itertools.islice(ItemStats.owners_by_total[total], count - len(result)))
+        return result
+
+
+class ShardedItemStore:
+    """按类别把物品分片保存在数据目录中
+
+    每个类别对应一个 JSON-lines 分片文件，manifest.json 只记录每个分片的文件名、
+    物品数量以及下一个物品ID。各所有者在分片中的物品数量保存在分片旁边的
+    "<分片>.owners.json" 中，只在重写该分片时一起重写；追加记录时只更新内存中的计数，
+    启动时再从分片文件末尾补上这些追加的记录。修改物品时只追加或重写所属的一个分片，
+    清单的大小只与类别数量有关。
+    """
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = {"next_item_id": 1, "shards": {}}
+        # 类别名称 -> {所有者ID字符串: 物品数量}
+        self.owners = {}
+        self.lock = threading.Lock()
+        path = os.path.join(directory, self.MANIFEST)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        upgraded = False
+        for category, info in self.manifest["shards"].items():
+            if "owners" in info:
+                # 旧版清单直接记录所有者数量，转存到分片旁边的文件中
+                self.owners[category] = info.pop("owners")
+                self._save_owners(info, self.owners[category])
+                upgraded = True
+            else:
+                self.owners[category] = self._load_owners(info)
+        if upgraded:
+            self._save_manifest()
+
+    @staticmethod
+    def exists(directory):
+        """目录中是否已有分片清单"""
+        return os.path.exists(os.path.join(directory, ShardedItemStore.MANIFEST))
+
+    @staticmethod
+    def shard_file(category):
+        """类别名称可能包含任意字符，用名称的哈希值作为分片文件名"""
+        return f"shard_{hashlib.md5(category.encode('utf-8')).hexdigest()[:12]}.jsonl"
+
+    def categories(self):
+        """返回所有有分片的类别"""
+        with self.lock:
+            return list(self.manifest["shards"])
+
+    def categories_for_owner(self, owner_id):
+        """返回某个用户有物品的类别"""
+        key = str(owner_id)
+        with self.lock:
+            return [category for category, owners in self.owners.items() if owners.get(key)]
+
+    def owner_counts(self):
+        """返回 {类别名称: {所有者ID: 物品数量}} 的副本"""
+        with self.lock:
+            return {category: {int(owner_key): count for owner_key, count in owners.items()}
+                    for category, owners in self.owners.items()}
+
+    def read_shard(self, category):
+        """读取一个分片中的全部记录"""
+        with self.lock:
+            info = self.manifest["shards"].get(category)
+        if info is None:
+            return []
+        return codec.read(os.path.join(self.directory, info["file"]))
+
+    def append(self, record):
+        """把一条记录追加到所属分片的末尾，只重写很小的清单"""
+        with self.lock:
+            info = self._shard_info(record["category"])
+            codec.write(os.path.join(self.directory, info["file"]), [record], append=True)
+            info["count"] += 1
+            owners = self.owners[record["category"]]
+            owner_key = str(record["owner_id"])
+            owners[owner_key] = owners.get(owner_key, 0) + 1
+            self.manifest["next_item_id"] = max(self.manifest["next_item_id"], record["item_id"] + 1)
+            self._save_manifest()
+
+    def write_shard(self, category, records):
+        """用 records 重写一个分片及其所有者计数，records 为空时删除该分片"""
+        with self.lock:
+            if not records:
+                info = self.manifest["shards"].pop(category, None)
+                self.owners.pop(category, None)
+                if info is not None:
+                    for path in (self._path(info), self._owners_path(info)):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    self._save_manifest()
+                return
+            info = self._shard_info(category)
+            path = self._path(info)
+            # 先写临时文件再替换，避免写到一半时留下损坏的分片
+            codec.write(path + ".tmp", records)
+            os.replace(path + ".tmp", path)
+            owners = {}
+            for record in records:
+                owner_key = str(record["owner_id"])
+                owners[owner_key] = owners.get(owner_key, 0) + 1
+            info["count"] = len(records)
+            self.owners[category] = owners
+            self._save_owners(info, owners)
+            self.manifest["next_item_id"] = max(self.manifest["next_item_id"],
+                                                max(record["item_id"] for record in records) + 1)
+            self._save_manifest()
+
+    @staticmethod
+    def migrate(items_file, directory):
+        """把单个物品文件按类别拆分到分片目录中，返回分片数量"""
+        shards = {}
+        next_item_id = 1
+        records = codec.read(items_file)
+        for record in records:
+            if record.get("item_id") is not None:
+                next_item_id = max(next_item_id, record["item_id"] + 1)
+        for record in records:
+            # 旧文件中没有 item_id，迁移时分配
+            if record.get("item_id") is None:
+                record["item_id"] = next_item_id
+                next_item_id += 1
+            shards.setdefault(record["category"], []).append(record)
+        store = ShardedItemStore(directory)
+        for category, shard_records in shards.items():
+            store.write_shard(category, shard_records)
+        return len(shards)
+
+    def _shard_info(self, category):
+        """返回类别的分片信息，不存在时新建"""
+        shards = self.manifest["shards"]
+        if category not in shards:
+            shards[category] = {"file": self.shard_file(category), "count": 0}
+            self.owners[category] = {}
+            os.makedirs(self.directory, exist_ok=True)
+        return shards[category]
+
+    def _path(self, info):
+        """分片文件的路径"""
+        return os.path.join(self.directory, info["file"])
+
+    def _owners_path(self, info):
+        """分片所有者计数文件的路径"""
+        return os.path.join(self.directory, os.path.splitext(info["file"])[0] + ".owners.json")
+
+    def _save_owners(self, info, owners):
+        """保存分片的所有者计数，并记录它覆盖到分片文件的哪个位置"""
+        path = self._owners_path(info)
+        shard_path = self._path(info)
+        size = os.path.getsize(shard_path) if os.path.exists(shard_path) else 0
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"size": size, "count": info["count"], "owners": owners}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _load_owners(self, info):
+        """读取分片的所有者计数，再补上之后追加到分片末尾的记录
+
+        计数文件缺失或与分片对不上（例如重写分片后没来得及保存计数）时，
+        重新读取整个分片计算。
+        """
+        shard_path = self._path(info)
+        try:
+            with open(self._owners_path(info), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            with open(shard_path, "rb") as f:
+                f.seek(max(saved["size"] - 1, 0))
+                boundary = f.read(1) if saved["size"] else b"\n"
+                tail = f.read()
+            if boundary == b"\n":
+                owners = saved["owners"]
+                appended = [codec.loads(line) for line in tail.split(b"\n") if line.strip()]
+                if saved["count"] + len(appended) == info["count"]:
+                    for record in appended:
+                        owner_key = str(record["owner_id"])
+                        owners[owner_key] = owners.get(owner_key, 0) + 1
+                    return owners
+        except (OSError, ValueError, KeyError):
+            pass
+        records = codec.read(shard_path) if os.path.exists(shard_path) else []
+        info["count"] = len(records)
+        owners = {}
+        for record in records:
+            owner_key = str(record["owner_id"])
+            owners[owner_key] = owners.get(owner_key, 0) + 1
+        return owners
+
+    def _save_manifest(self):
+        """保存分片清单"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+class WriteAheadLog:
+    """物品修改的预写日志
+
+    append() 把记录放入队列，由提交线程批量写入并只调用一次 fsync（组提交），
+    落盘后返回的 Future 才完成。没有写入在进行时立即提交，不额外等待；
+    正在写入和 fsync 期间到达的记录在下一批一起提交，并发写入越多，每次 fsync 分摊的记录就越多。
+    合并到数据文件前先用 rotate() 把当前日志改名为 "<path>.1"，合并完成后删除；
+    启动时依次重放 "<path>.1" 和 "<path>" 中的记录。
+    """
+
+    def __init__(self, path, max_batch=256):
+        self.path = path
+        self.max_batch = max_batch
+        # 崩溃可能留下写到一半的最后一行，截掉后新记录才不会接在它后面而读不出来
+        WriteAheadLog.repair(path + ".1")
+        # 当前日志文件中的记录数量，用于判断何时合并
+        self.count = WriteAheadLog.repair(path)
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        # 写文件、fsync 和轮换日志时持有
+        self._file_lock = threading.Lock()
+        self._file = open(path, "ab")
+        self._thread = threading.Thread(target=self._run, name="item-wal", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def read(path):
+        """按顺序读取轮换出去的日志和当前日志中的全部记录
+
+        写到一半的最后一行没有被确认过，遇到无法解析的行时忽略其后的内容。
+        """
+        return codec.read(path + ".1", stop_on_error=True) + codec.read(path, stop_on_error=True)
+
+    @staticmethod
+    def repair(path):
+        """把日志截断到最后一条完整记录的末尾，返回保留的记录数量
+
+        截断的位置与 read() 停止读取的位置相同，所以保留的正好是启动时重放过的记录。
+        """
+        if not os.path.exists(path):
+            return 0
+        valid = 0
+        count = 0
+        newline = True
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        codec.loads(line)
+                    except ValueError:
+                        break
+                    count += 1
+                valid += len(line)
+                newline = line.endswith(b"\n")
+            size = f.seek(0, os.SEEK_END)
+        if valid < size or not newline:
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+                if not newline:
+                    # 最后一条记录完整但缺少换行符，补上换行符再追加新记录
+                    f.seek(valid)
+                    f.write(b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+        return count
+
+    @staticmethod
+    def remove_rotated(path):
+        """合并完成后删除轮换出去的日志"""
+        if os.path.exists(path + ".1"):
+            os.remove(path + ".1")
+
+    def append(self, record):
+        """把记录加入提交队列，返回记录落盘后完成的 Future"""
+        ack = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("预写日志已关闭")
+            self._pending.append((codec.dumps(record) + b"\n", ack))
+            self._cond.notify()
+        return ack
+
+    def flush(self):
+        """等待队列中已有的记录全部落盘"""
+        with self._cond:
+            last = self._pending[-1][1] if self._pending else None
+        if last is not None:
+            last.result()
+        # 提交线程可能正在写已经取出的批次
+        with self._file_lock:
+            pass
+
+    def rotate(self):
+        """等待已提交的记录落盘后把当前日志改名为 "<path>.1"，之后的记录写入新日志
+
+        调用方需保证轮换期间没有新的 append()。上一次合并没有完成时，
+        把当前日志追加到已有的 "<path>.1" 后面。
+        """
+        self.flush()
+        with self._file_lock:
+            self._file.close()
+            rotated = self.path + ".1"
+            if os.path.exists(rotated):
+                with open(self.path, "rb") as src, open(rotated, "ab") as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.path)
+            elif os.path.exists(self.path):
+                os.replace(self.path, rotated)
+            self._file = open(self.path, "ab")
+            self.count = 0
+
+    def close(self):
+        """提交剩余的记录并停止提交线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+
+    def _run(self):
+        """提交线程：取出已到达的记录，写入后只 fsync 一次，再通知所有等待者"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            with self._file_lock:
+                with self._cond:
+                    batch = self._pending[:self.max_batch]
+                    del self._pending[:self.max_batch]
+                try:
+                    self._file.write(b"".join(line for line, _ in batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self.count += len(batch)
+                except OSError as e:
+                    for _, ack in batch:
+                        ack.set_exception(e)
+                    continue
+            for _, ack in batch:
+                ack.set_result(None)
+
+class SearchCache:
+    """搜索结果的 LRU/TTL 缓存
+
+    以规范化后的 (类别, 关键词) 为键。搜索按 "类别条件 in 物品类别" 匹配，
+    所以类别为 c 的物品变化时，只需移除类别条件是 c 的子串的缓存项。
+    """
+
+    def __init__(self, max_size=256, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # 每次失效加一；计算期间发生过失效的结果不写入缓存，避免缓存旧结果
+        self.generation = 0
+        self._entries = OrderedDict()  # (类别, 关键词) -> (写入时间, 结果)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(category, keyword):
+        """规范化搜索条件：去掉首尾空白，关键词不区分大小写"""
+        return category.strip(), keyword.strip().lower()
+
+    def get(self, category, keyword):
+        """返回缓存的结果副本，未命中或已过期时返回 None"""
+        key = (category, keyword)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, category, keyword, results, generation):
+        """缓存结果；generation 为开始搜索时的 self.generation"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[(category, keyword)] = (time.monotonic(), list(results))
+            self._entries.move_to_end((category, keyword))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *item_categories):
+        """移除类别条件能匹配 item_categories 中任一类别的缓存项"""
+        item_categories = [name for name in item_categories if name is not None]
+        with self._lock:
+            self.generation += 1
+            stale = [key for key in self._entries
+                     if any(key[0] in name for name in item_categories)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """返回命中、未命中、淘汰、失效次数和当前大小，用于调整缓存大小"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+Item.search_cache = SearchCache(Item.SEARCH_CACHE_SIZE, Item.SEARCH_CACHE_TTL)
+
+
+class SearchSnapshot:
+    """并行搜索使用的共享内存快照
+
+    text 中依次保存每个物品的 "类别\x1f小写名称\x1f小写描述\x1e"（UTF-8 编码），
+    offsets 中保存每个物品在 text 中的起始字节位置（int64），最后一项为总长度。
+    共享内存建立后不再修改：被删除或修改的物品记为墓碑，新增和修改后的物品放入补丁，
+    补丁和墓碑超过物品数量的 PATCH_RATIO 时才需要重新建立快照。
+    """
+    FIELD_SEP = "\x1f"
+    RECORD_SEP = "\x1e"
+    PATCH_RATIO = 0.05
+
+    def __init__(self, items):
+        self.items = items
+        # 物品ID -> 在快照中的序号
+        self.positions = {item.item_id: index for index, item in enumerate(items)}
+        # 已删除或已修改、扫描结果中需要剔除的序号
+        self.tombstones = set()
+        # 快照建立后新增或修改的物品：物品ID -> 物品
+        self.patch = {}
+        offsets = array("q", [0])
+        parts = []
+        position = 0
+        for item in items:
+            fields = (item.category, item.name.lower(), item.description.lower())
+            # 字段中的分隔符替换为空格，保证子进程能正确拆分
+            record = self.FIELD_SEP.join(field.replace(self.FIELD_SEP, " ").replace(self.RECORD_SEP, " ") for field in fields)
+            data = (record + self.RECORD_SEP).encode("utf-8")
+            parts.append(data)
+            position += len(data)
+            offsets.append(position)
+        text = b"".join(parts)
+        self.text = shared_memory.SharedMemory(create=True, size=max(len(text), 1))
+        self.text.buf[:len(text)] = text
+        offsets_bytes = offsets.tobytes()
+        self.offsets = shared_memory.SharedMemory(create=True, size=len(offsets_bytes))
+        self.offsets.buf[:len(offsets_bytes)] = offsets_bytes
+
+    def apply(self, changes):
+        """应用物品的变化，changes 为 物品ID -> 当前的物品（已删除时为 None）"""
+        for item_id, item in changes.items():
+            index = self.positions.get(item_id)
+            if index is not None:
+                self.tombstones.add(index)
+            if item is None:
+                self.patch.pop(item_id, None)
+            else:
+                self.patch[item_id] = item
+
+    def needs_rebuild(self):
+        """补丁和墓碑是否多到应该重新建立快照"""
+        return len(self.patch) + len(self.tombstones) > len(self.items) * self.PATCH_RATIO
+
+    def search_patch(self, category, keyword):
+        """顺序扫描补丁中的物品"""
+        return [item for item in self.patch.values()
+                if category in item.category and (keyword in item.name.lower() or keyword in item.description.lower())]
+
+    def close(self):
+        """释放共享内存"""
+        for block in (self.text, self.offsets):
+            block.close()
+            block.unlink()
+
+
+def attach_shared_memory(name):
+    """在子进程中打开主进程创建的共享内存，由主进程负责删除"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数；子进程与主进程共用资源跟踪器，重复登记不影响删除
+        return shared_memory.SharedMemory(name=name)
+
+
+def search_chunk(text_name, offsets_name, start, end, category, keyword):
+    """在子进程中扫描快照中第 start 到 end 个物品，返回匹配物品的序号"""
+    text = attach_shared_memory(text_name)
+    offsets_block = attach_shared_memory(offsets_name)
+    try:
+        offsets = offsets_block.buf.cast("q")
+        try:
+            chunk = bytes(text.buf[offsets[start]:offsets[end]]).decode("utf-8")
+        finally:
+            # 关闭共享内存前必须释放引用它的视图
+            offsets.release()
+    finally:
+        text.close()
+        offsets_block.close()
+    matches = []
+    records = chunk.split(SearchSnapshot.RECORD_SEP)
+    for index, record in enumerate(records[:-1], start):
+        item_category, name, description = record.split(SearchSnapshot.FIELD_SEP)
+        if category in item_category and (keyword in name or keyword in description):
+            matches.append(index)
+    return matches
+
+# 4. 定义事件总线，通知打开的窗口和缓存数据已经变化
+class Event:
+    """所有事件的基类"""
+
+    def key(self):
+        """同一帧内 key 相同的事件会被合并，默认不合并"""
+        return id(self)
+
+    def merge(self, previous):
+        """与本帧内较早的同 key 事件合并，返回合并后的事件，两者抵消时返回 None"""
+        return self
+
+
+class ItemEvent(Event):
+    """物品变化事件"""
+
+    def __init__(self, item):
+        self.item = item
+
+    def key(self):
+        return ("item", self.item.item_id)
+
+    def merge(self, previous):
+        # 本帧内新增的物品：之后的修改仍算新增，之后被删除则两者抵消
+        if isinstance(previous, ItemAdded):
+            return None if isinstance(self, ItemDeleted) else ItemAdded(self.item)
+        return self
+
+
+class ItemAdded(ItemEvent):
+    """新增了物品"""
+
+
+class ItemModified(ItemEvent):
+    """物品的名称、描述或类别被修改"""
+
+
+class ItemDeleted(ItemEvent):
+    """物品被删除"""
+
+
+class CategoryChanged(Event):
+    """物品类别被添加、修改、重命名、合并或删除
+
+    action 为 "added"、"modified"、"renamed"、"merged" 或 "deleted"；
+    重命名时 new_name 为新名称，合并和删除时为接收物品的类别。
+    """
+
+    def __init__(self, name, action, new_name=None):
+        self.name = name
+        self.action = action
+        self.new_name = new_name
+
+
+class UserEvent(Event):
+    """用户变化事件"""
+
+    def __init__(self, user):
+        self.user = user
+
+    def key(self):
+        return (type(self), self.user.user_id)
+
+
+class UserRegistered(UserEvent):
+    """新用户注册"""
+
+
+class UserVerified(UserEvent):
+    """用户通过管理员审核"""
+
+
+class EventBus:
+    """进程内的发布/订阅事件总线
+
+    处理函数在发布事件的线程中同步调用，订阅某个事件类时也会收到其子类事件。
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type, handler):
+        """订阅 event_type 类型的事件"""
+        with self._lock:
+            self._subscribers.setdefault(event_type, []).append(handler)
+        return handler
+
+    def unsubscribe(self, event_type, handler):
+        """取消订阅"""
+        with self._lock:
+            handlers = self._subscribers.get(event_type, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def publish(self, event):
+        """把事件发送给所有订阅了该事件类或其父类的处理函数"""
+        with self._lock:
+            handlers = [handler for event_type in type(event).__mro__
+                        for handler in self._subscribers.get(event_type, ())]
+        for handler in handlers:
+            handler(event)
+
+
+# 全局事件总线，模型类在数据变化后向它发布事件
+events = EventBus()
+
+
+class UIEventDispatcher:
+    """把事件总线上的事件转交给 Tk 主线程
+
+    事件可能在后台线程中发布，这里先放入队列，每一帧合并一次后再分发给打开的窗口，
+    窗口只需按事件增量更新，不必重建整个列表。
+    """
+    FRAME_INTERVAL = 16  # 毫秒
+
+    def __init__(self, root, bus):
+        self.root = root
+        self.views = []
+        self._pending = queue.Queue()
+        bus.subscribe(Event, self._pending.put)
+        self._poll_id = self.root.after(self.FRAME_INTERVAL, self._flush)
+
+    def subscribe(self, handler, *event_types, window=None):
+        """订阅事件，handler 在主线程中以合并后的事件列表调用；window 关闭时自动取消订阅"""
+        view = (event_types, handler)
+        self.views.append(view)
+        if window is not None:
+            window.bind("<Destroy>", lambda e: e.widget is window and self.unsubscribe(view), add="+")
+        return view
+
+    def unsubscribe(self, view):
+        """取消订阅"""
+        if view in self.views:
+            self.views.remove(view)
+
+    def shutdown(self):
+        """停止分发事件"""
+        self.root.after_cancel(self._poll_id)
+
+    @staticmethod
+    def coalesce(events):
+        """合并同一帧内的事件，同一物品的多次变化只保留最终结果"""
+        merged = {}
+        for event in events:
+            key = event.key()
+            previous = merged.pop(key, None)
+            if previous is not None:
+                event = event.merge(previous)
+                if event is None:
+                    continue
+            merged[key] = event
+        return list(merged.values())
+
+    def _flush(self):
+        """取出本帧内的事件，合并后分发给订阅的窗口"""
+        try:
+            pending = []
+            while True:
+                try:
+                    pending.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            if pending and self.views:
+                merged = self.coalesce(pending)
+                for event_types, handler in list(self.views):
+                    relevant = [event for event in merged if isinstance(event, event_types)]
+                    if relevant:
+                        handler(relevant)
+        finally:
+            self._poll_id = self.root.after(self.FRAME_INTERVAL, self._flush)
+
+# 5. 定义后台任务执行器，避免存储和搜索操作阻塞 Tk 主循环
+class TaskCancelled(Exception):
+    """后台任务被用户取消"""
+
+
+class BackgroundTask:
+    """后台任务句柄，工作线程通过它检查取消标记并汇报进度"""
+
+    def __init__(self, task_id, description, cancellable, results):
+        self.task_id = task_id
+        self.description = description
+        self.cancellable = cancellable
+        self.progress = None  # (已完成, 总数)，只在主线程中更新
+        self.future = None
+        self._results = results
+        self._cancel_event = threading.Event()
+
+    def cancelled(self):
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """在检查点调用，已请求取消时抛出 TaskCancelled"""
+        if self._cancel_event.is_set():
+            raise TaskCancelled(self.description)
+
+    def report_progress(self, done, total):
+        """汇报进度，由主线程轮询时更新进度条"""
+        self._results.put(("progress", self.task_id, (done, total)))
+
+
+class BackgroundWorker:
+    """在后台线程执行耗时操作，并通过 after() 轮询把结果交回 Tk 主线程
+
+    写文件的操作在单线程的 "io" 通道中按提交顺序执行，保证文件内容不会被
+    旧快照覆盖；搜索等只读扫描在 "search" 通道中执行，不会被慢速写操作阻塞。
+    所有回调都在主线程中调用，可以直接操作控件。
+    """
+    POLL_INTERVAL = 50  # 毫秒
+
+    def __init__(self, root, on_status=None):
+        self.root = root
+        self.on_status = on_status  # on_status(进行中的任务列表)
+        self.tasks = {}
+        self._results = queue.Queue()
+        self._next_task_id = 0
+        self._executors = {
+            "io": ThreadPoolExecutor(max_workers=1, thread_name_prefix="item-io"),
+            "search": ThreadPoolExecutor(max_workers=2, thread_name_prefix="item-search"),
+        }
+        self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)
+
+    def submit(self, func, *args, on_done=None, on_error=None, description="", channel="io", cancellable=False):
+        """提交后台任务，func 的第一个参数是 BackgroundTask，回调在主线程中执行"""
+        self._next_task_id += 1
+        task = BackgroundTask(self._next_task_id, description, cancellable, self._results)
+        self.tasks[task.task_id] = (task, on_done, on_error)
+        task.future = self._executors[channel].submit(self._run, task, func, args)
+        self._notify_status()
+        return task
+
+    def cancel(self, task):
+        """取消任务：未开始的直接丢弃，运行中的在下一个检查点退出"""
+        if not task.cancellable:
+            return
+        task._cancel_event.set()
+        if task.future.cancel():
+            # 任务还没开始执行，_run 不会再把结果放入队列
+            self._results.put(("cancelled", task.task_id, None))
+
+    def cancel_all(self):
+        """取消所有可取消的任务"""
+        for task, _, _ in list(self.tasks.values()):
+            self.cancel(task)
+
+    def active_tasks(self):
+        """返回尚未完成的任务"""
+        return [task for task, _, _ in self.tasks.values()]
+
+    def shutdown(self):
+        """停止轮询，取消可取消的任务，并等待已提交的写操作完成"""
+        self.root.after_cancel(self._poll_id)
+        self.cancel_all()
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+
+    def _run(self, task, func, args):
+        """在工作线程中执行任务，把结果或异常放入队列
+
+        func 返回 Future 时（例如等待预写日志落盘），不占用工作线程等待，
+        Future 完成后再把它的结果放入队列，通道中的下一个任务可以立即开始。
+        """
+        try:
+            task.check_cancelled()
+            result = func(task, *args)
+        except TaskCancelled:
+            self._results.put(("cancelled", task.task_id, None))
+        except Exception as e:
+            self._results.put(("error", task.task_id, e))
+        else:
+            if isinstance(result, Future):
+                result.add_done_callback(lambda future: self._finish(task, future))
+            else:
+                self._results.put(("done", task.task_id, result))
+
+    def _finish(self, task, future):
+        """任务返回的 Future 完成后，把结果或异常放入队列"""
+        error = future.exception()
+        if error is not None:
+            self._results.put(("error", task.task_id, error))
+        else:
+            self._results.put(("done", task.task_id, future.result()))
+
+    def _poll(self):
+        """在主线程中取出工作线程的结果并调用回调"""
+        changed = False
+        try:
+            while True:
+                try:
+                    kind, task_id, payload = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                changed = True
+                if kind == "progress":
+                    if task_id in self.tasks:
+                        self.tasks[task_id][0].progress = payload
+                    continue
+                task, on_done, on_error = self.tasks.pop(task_id, (None, None, None))
+                if task is None:
+                    continue
+                if kind == "done" and on_done is not None:
+                    on_done(payload)
+                elif kind == "error":
+                    if on_error is not None:
+                        on_error(payload)
+                    else:
+                        messagebox.showerror("错误", f"{task.description}失败：{payload}")
+        finally:
+            if changed:
+                self._notify_status()
+            self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)
+
+    def _notify_status(self):
+        if self.on_status is not None:
+            self.on_status(self.active_tasks())
+
+# 6. 定义 Application 类，包含GUI逻辑
 class Application(tk.Tk):
+    # 我的物品面板每页显示的物品数量
+    MY_ITEMS_PAGE_SIZE = 20
+    # 全部物品列表每页显示的物品数量
+    ALL_ITEMS_PAGE_SIZE = 20
+    # 统计面板中列出的物品最多的用户数量
+    DASHBOARD_TOP_OWNERS = 10
+
     def __init__(self):
         super().__init__()
 
         self.title("物品复活系统")
         self.geometry("900x700")
 
-        # 加载用户信息
-        self.users = User.load_users()
+        self.users = {}
+        self.data_loaded = False
+        self.current_user = None
+
+        self.create_widgets()
+
+        # 耗时的文件读写和搜索都交给后台线程，主循环保持响应
+        self.worker = BackgroundWorker(self, on_status=self.update_status)
+
+        # 数据变化事件每帧合并一次后分发给打开的窗口
+        self.ui_events = UIEventDispatcher(self, events)
+
+        # 在后台加载用户、物品类别和物品信息，加载完成前禁止登录和注册
+        self.worker.submit(self.load_data, on_done=self.on_data_loaded, description="加载数据")
+
+    @staticmethod
+    def load_data(task):
+        """在后台线程中加载用户信息、物品类别和物品信息"""
+        users = User.load_users()
+        ItemCategory.load_categories()
+        Item.load_items(users)
+        return users
+
+    def on_data_loaded(self, users):
+        """数据加载完成后在主线程中调用"""
+        self.users = users
+        self.data_loaded = True
 
         # 确保Admin存在，如果没有，则创建一个
         if 1 not in self.users:
             admin = Admin(1, "管理员", "Admin Street", "1234567890", "admin@admin.com")
             self.users[admin.user_id] = admin
-            admin.save_to_file()
+            User.index_user(admin)
+            UserStats.add(admin)
+            self.worker.submit(lambda task: admin.save_to_file(), description="保存管理员信息")
 
-        # 加载物品类别
-        ItemCategory.load_categories()
+        self.login_button.config(state=tk.NORMAL)
+        self.register_button.config(state=tk.NORMAL)
 
-        # 加载物品信息
-        Item.load_items(self.users)
+        # 使用分片目录时定期把长时间未访问的分片移出内存
+        if Item.store is not None:
+            self.after(Item.SHARD_IDLE_SECONDS * 1000, self.evict_cold_shards)
 
-        self.current_user = None
-
-        self.create_widgets()
+    def evict_cold_shards(self):
+        """在后台移除冷分片，并安排下一次检查"""
+        self.worker.submit(lambda task: Item.evict_cold_shards(), description="释放未使用的物品分片")
+        self.after(Item.SHARD_IDLE_SECONDS * 1000, self.evict_cold_shards)
 
     def create_widgets(self):
         # 主内容框架
@@ -303,36 +2051,36 @@ class Application(tk.Tk):
         self.add_item_button = tk.Button(self.buttons_frame, text="添加物品", command=self.add_item, state=tk.DISABLED)
         self.add_item_button.grid(row=0, column=0, padx=5, pady=5)
 
-        # 修改物品按钮（普通用户）
-        self.modify_item_button = tk.Button(self.buttons_frame, text="修改物品", command=self.modify_item, state=tk.DISABLED)
-        self.modify_item_button.grid(row=0, column=1, padx=5, pady=5)
+        # 我的物品按钮（普通用户），在其中修改和删除自己的物品
+        self.my_items_button = tk.Button(self.buttons_frame, text="我的物品", command=self.my_items, state=tk.DISABLED)
+        self.my_items_button.grid(row=0, column=1, padx=5, pady=5)
 
         # 搜索物品按钮（普通用户）
         self.search_item_button = tk.Button(self.buttons_frame, text="搜索物品", command=self.search_item, state=tk.DISABLED)
         self.search_item_button.grid(row=0, column=2, padx=5, pady=5)
 
-        # 删除物品按钮（普通用户）
-        self.delete_item_button = tk.Button(self.buttons_frame, text="删除物品", command=self.delete_item, state=tk.DISABLED)
-        self.delete_item_button.grid(row=0, column=3, padx=5, pady=5)
-
         # 显示全部物品按钮（管理员）
         self.view_all_items_button = tk.Button(self.buttons_frame, text="显示全部物品", command=self.view_all_items, state=tk.DISABLED)
-        self.view_all_items_button.grid(row=0, column=4, padx=5, pady=5)
+        self.view_all_items_button.grid(row=0, column=3, padx=5, pady=5)
 
         # 审核待审核用户按钮（管理员）
         self.view_pending_users_button = tk.Button(self.buttons_frame, text="审核待审核用户", command=self.view_pending_users, state=tk.DISABLED)
-        self.view_pending_users_button.grid(row=0, column=5, padx=5, pady=5)
+        self.view_pending_users_button.grid(row=0, column=4, padx=5, pady=5)
 
         # 管理物品类别按钮（管理员）
         self.manage_categories_button = tk.Button(self.buttons_frame, text="管理物品类别", command=self.manage_categories, state=tk.DISABLED)
-        self.manage_categories_button.grid(row=0, column=6, padx=5, pady=5)
+        self.manage_categories_button.grid(row=0, column=5, padx=5, pady=5)
 
         # 重置密码按钮（管理员）
         self.reset_password_button = tk.Button(self.buttons_frame, text="重置用户密码", command=self.reset_user_password, state=tk.DISABLED)
-        self.reset_password_button.grid(row=0, column=7, padx=5, pady=5)
+        self.reset_password_button.grid(row=0, column=6, padx=5, pady=5)
+
+        # 统计面板按钮（管理员）
+        self.dashboard_button = tk.Button(self.buttons_frame, text="统计面板", command=self.open_dashboard, state=tk.DISABLED)
+        self.dashboard_button.grid(row=0, column=7, padx=5, pady=5)
 
         # 注册按钮
-        self.register_button = tk.Button(self.main_frame, text="注册", command=self.open_register_window)
+        self.register_button = tk.Button(self.main_frame, text="注册", command=self.open_register_window, state=tk.DISABLED)
         self.register_button.pack(pady=10)
 
         # 注销按钮
@@ -343,7 +2091,7 @@ class Application(tk.Tk):
         self.login_frame = tk.Frame(self)
         self.login_frame.pack(side="bottom", fill="x", pady=20)
 
-        self.login_user_id_label = tk.Label(self.login_frame, text="用户ID:")
+        self.login_user_id_label = tk.Label(self.login_frame, text="用户ID/电话/邮箱:")
         self.login_user_id_label.grid(row=0, column=0, padx=5, pady=5)
         self.login_user_id_entry = tk.Entry(self.login_frame)
         self.login_user_id_entry.grid(row=0, column=1, padx=5, pady=5)
@@ -353,9 +2101,60 @@ class Application(tk.Tk):
         self.login_password_entry = tk.Entry(self.login_frame, show="*")
         self.login_password_entry.grid(row=1, column=1, padx=5, pady=5)
 
-        self.login_button = tk.Button(self.login_frame, text="登录", command=self.login)
+        self.login_button = tk.Button(self.login_frame, text="登录", command=self.login, state=tk.DISABLED)
         self.login_button.grid(row=2, column=0, columnspan=2, pady=10)
 
+        # 状态栏：显示后台任务、进度和取消按钮
+        self.status_frame = tk.Frame(self, relief="sunken", borderwidth=1)
+        self.status_frame.pack(side="bottom", fill="x", before=self.login_frame)
+
+        self.status_label = tk.Label(self.status_frame, text="就绪", anchor="w")
+        self.status_label.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.cancel_task_button = tk.Button(self.status_frame, text="取消", command=self.cancel_tasks, state=tk.DISABLED)
+        self.cancel_task_button.pack(side="right", padx=5, pady=2)
+
+        self.progress_bar = ttk.Progressbar(self.status_frame, length=200, mode="indeterminate")
+        self.progress_bar.pack(side="right", padx=5, pady=2)
+        self.progress_bar_running = False
+
+    def update_status(self, tasks):
+        """根据进行中的后台任务更新状态栏、进度条和鼠标指针"""
+        if not tasks:
+            self.status_label.config(text="就绪")
+            self.progress_bar.stop()
+            self.progress_bar_running = False
+            self.progress_bar.config(mode="indeterminate", value=0)
+            self.cancel_task_button.config(state=tk.DISABLED)
+            self.config(cursor="")
+            return
+
+        task = tasks[-1]
+        text = f"正在{task.description}…"
+        if len(tasks) > 1:
+            text += f"（另有 {len(tasks) - 1} 个任务）"
+        self.status_label.config(text=text)
+
+        if task.progress and task.progress[1]:
+            # 任务汇报了进度，显示具体位置
+            done, total = task.progress
+            self.progress_bar.stop()
+            self.progress_bar_running = False
+            self.progress_bar.config(mode="determinate", maximum=total, value=done)
+        elif not self.progress_bar_running:
+            # 没有进度信息时显示忙碌动画
+            self.progress_bar.config(mode="indeterminate")
+            self.progress_bar.start(10)
+            self.progress_bar_running = True
+
+        can_cancel = any(t.cancellable for t in tasks)
+        self.cancel_task_button.config(state=tk.NORMAL if can_cancel else tk.DISABLED)
+        self.config(cursor="watch")
+
+    def cancel_tasks(self):
+        """取消所有可取消的后台任务"""
+        self.worker.cancel_all()
+
     def open_register_window(self):
         """打开注册窗口"""
         register_window = tk.Toplevel(self)
@@ -391,27 +2190,36 @@ class Application(tk.Tk):
             messagebox.showerror("错误", "所有字段均为必填项。")
             return
 
+        # 邮箱和电话不能与已有用户重复
+        try:
+            User.check_unique(email, phone)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+
         # 创建用户并保存
         user = User(name, address, phone, email)
         self.users[user.user_id] = user
+        User.index_user(user)
+        UserStats.add(user)
+        events.publish(UserRegistered(user))
 
-        # 将用户信息保存到文件
-        user.save_to_file()
+        # 在后台将用户信息追加到文件
+        self.worker.submit(lambda task: user.save_to_file(), description="保存注册信息")
 
         messagebox.showinfo("注册成功", f"{name} 注册成功！\n您的用户ID是 {user.user_id}\n初始密码是 'user123'，请等待管理员审核。")
         register_window.destroy()
 
     def login(self):
-        """用户登录"""
-        user_id = self.login_user_id_entry.get()
+        """用户登录，可以使用用户ID、电话或邮箱"""
+        identifier = self.login_user_id_entry.get()
         password = self.login_password_entry.get()
 
-        if not user_id.isdigit():
-            messagebox.showerror("登录失败", "用户ID必须是数字。")
+        if not identifier.strip():
+            messagebox.showerror("登录失败", "请输入用户ID、电话或邮箱。")
             return
 
-        user_id = int(user_id)
-        user = self.users.get(user_id)
+        user = User.find_by_login(identifier, self.users)
 
         if user:
             if user.check_password(password):
@@ -429,25 +2237,26 @@ class Application(tk.Tk):
             else:
                 messagebox.showerror("登录失败", "密码错误。")
         else:
-            messagebox.showerror("登录失败", "无效的用户ID。")
+            messagebox.showerror("登录失败", "无效的用户ID、电话或邮箱。")
 
     def enable_user_buttons(self):
         """根据当前用户角色启用按钮"""
         self.add_item_button.config(state=tk.NORMAL)
-        self.modify_item_button.config(state=tk.NORMAL)
+        self.my_items_button.config(state=tk.NORMAL)
         self.search_item_button.config(state=tk.NORMAL)
-        self.delete_item_button.config(state=tk.NORMAL)
         self.logout_button.config(state=tk.NORMAL)
 
         if self.current_user.role == "admin":
             self.view_pending_users_button.config(state=tk.NORMAL)
             self.manage_categories_button.config(state=tk.NORMAL)
             self.reset_password_button.config(state=tk.NORMAL)
+            self.dashboard_button.config(state=tk.NORMAL)
             self.view_all_items_button.config(state=tk.NORMAL)
         else:
             self.view_pending_users_button.config(state=tk.DISABLED)
             self.manage_categories_button.config(state=tk.DISABLED)
             self.reset_password_button.config(state=tk.DISABLED)
+            self.dashboard_button.config(state=tk.DISABLED)
             self.view_all_items_button.config(state=tk.DISABLED)
 
         # 禁用登录按钮和注册按钮
@@ -458,12 +2267,12 @@ class Application(tk.Tk):
         """注销当前用户，返回登录界面"""
         self.current_user = None
         self.add_item_button.config(state=tk.DISABLED)
-        self.modify_item_button.config(state=tk.DISABLED)
+        self.my_items_button.config(state=tk.DISABLED)
         self.search_item_button.config(state=tk.DISABLED)
-        self.delete_item_button.config(state=tk.DISABLED)
         self.view_pending_users_button.config(state=tk.DISABLED)
         self.manage_categories_button.config(state=tk.DISABLED)
         self.reset_password_button.config(state=tk.DISABLED)
+        self.dashboard_button.config(state=tk.DISABLED)
         self.view_all_items_button.config(state=tk.DISABLED)
         self.logout_button.config(state=tk.DISABLED)
 
@@ -478,7 +2287,7 @@ class Application(tk.Tk):
         messagebox.showinfo("注销", "已成功注销当前用户。")
 
     def view_pending_users(self):
-        """显示所有待审核的用户并允许管理员审核"""
+        """显示所有待审核的用户并允许管理员审核，新注册和已审核的用户会实时更新"""
         if isinstance(self.current_user, Admin):
             pending_users = self.current_user.view_pending_users(self.users)
             if not pending_users:
@@ -509,27 +2318,43 @@ class Application(tk.Tk):
             canvas.pack(side="left", fill="both", expand=True)
             scrollbar.pack(side="right", fill="y")
 
-            for user in pending_users:
+            # 用户ID -> 外框
+            rows = {}
+
+            def add_row(user):
                 frame = tk.Frame(scrollable_frame, borderwidth=1, relief="solid", padx=10, pady=10)
                 frame.pack(padx=10, pady=5, fill="x")
 
                 info = f"用户ID: {user.user_id}\n姓名: {user.name}\n地址: {user.address}\n电话: {user.phone}\n邮箱: {user.email}"
                 tk.Label(frame, text=info, justify="left").pack(side="left")
 
-                approve_button = tk.Button(frame, text="审核通过", command=lambda u=user, w=pending_window: self.approve_user(u, w))
+                approve_button = tk.Button(frame, text="审核通过", command=lambda u=user: self.approve_user(u))
                 approve_button.pack(side="right")
+                rows[user.user_id] = frame
+
+            def on_user_events(user_events):
+                for event in user_events:
+                    user_id = event.user.user_id
+                    if isinstance(event, UserVerified):
+                        if user_id in rows:
+                            rows.pop(user_id).destroy()
+                    elif user_id not in rows and not event.user.is_verified and event.user.role != "admin":
+                        add_row(event.user)
+
+            for user in pending_users:
+                add_row(user)
+            self.ui_events.subscribe(on_user_events, UserEvent, window=pending_window)
 
         else:
             messagebox.showerror("权限不足", "只有管理员才能查看待审核用户。")
 
-    def approve_user(self, user, pending_window):
+    def approve_user(self, user):
         """管理员审核通过用户"""
         if isinstance(self.current_user, Admin):
             approval_message = self.current_user.approve_user(user)
-            # 更新用户信息到文件
-            self.save_all_users()
+            # 在后台更新用户信息到文件
+            self.save_all_users_async()
             messagebox.showinfo("用户审核", approval_message)
-            pending_window.destroy()
         else:
             messagebox.showerror("权限不足", "您没有权限审核用户。")
 
@@ -551,6 +2376,21 @@ class Application(tk.Tk):
         for category in ItemCategory.categories:
             listbox.insert(tk.END, category)
 
+        def on_category_events(category_events):
+            for event in category_events:
+                names = listbox.get(0, tk.END)
+                if event.action == "added":
+                    if event.name not in names:
+                        listbox.insert(tk.END, event.name)
+                elif event.action in ("renamed", "merged", "deleted") and event.name in names:
+                    index = names.index(event.name)
+                    listbox.delete(index)
+                    if event.action == "renamed":
+                        listbox.insert(index, event.new_name)
+
+        # 类别变化（包括其他窗口中的操作）都会实时反映到列表中
+        self.ui_events.subscribe(on_category_events, CategoryChanged, window=manage_window)
+
         # 按钮框架
         buttons_frame = tk.Frame(manage_window)
         buttons_frame.pack(pady=10)
@@ -564,6 +2404,23 @@ class Application(tk.Tk):
         modify_button = tk.Button(buttons_frame, text="修改类别", command=lambda: self.modify_category(listbox))
         modify_button.grid(row=0, column=2, padx=5)
 
+        rename_button = tk.Button(buttons_frame, text="重命名类别", command=lambda: self.rename_category(listbox))
+        rename_button.grid(row=0, column=3, padx=5)
+
+        merge_button = tk.Button(buttons_frame, text="合并类别", command=lambda: self.merge_category(listbox))
+        merge_button.grid(row=0, column=4, padx=5)
+
+    def save_category_changes(self, changed_categories):
+        """在后台保存类别文件，有物品被重新归类时一并写入物品文件"""
+        self.worker.submit(lambda task: ItemCategory.save_changes(changed_categories), description="保存物品类别")
+
+    def run_category_change(self, func, on_done):
+        """在后台执行会重新归类物品的类别操作，操作不合法时显示错误信息"""
+        def on_error(e):
+            messagebox.showerror("错误", str(e) if isinstance(e, ValueError) else f"修改物品类别失败：{e}")
+
+        self.worker.submit(lambda task: func(), on_done=on_done, on_error=on_error, description="修改物品类别")
+
     def add_category(self, listbox):
         """添加物品类别"""
         type_name = simpledialog.askstring("添加类别", "请输入物品类别名称：")
@@ -575,20 +2432,28 @@ class Application(tk.Tk):
             if not attributes:
                 messagebox.showerror("错误", "类别描述不能为空。")
                 return
-            ItemCategory.add_category(type_name, attributes)
-            listbox.insert(tk.END, type_name)
+            ItemCategory.add_category(type_name, attributes, save=False)
+            self.save_category_changes([])
 
     def delete_category(self, listbox):
-        """删除物品类别"""
+        """删除物品类别，类别下仍有物品时要求选择新的类别"""
         selected = listbox.curselection()
         if not selected:
             messagebox.showerror("错误", "请选择要删除的类别。")
             return
         type_name = listbox.get(selected[0])
+        reassign_to = None
+        count = Item.count_in_category(type_name)
+        if count:
+            reassign_to = simpledialog.askstring("删除类别", f"类别 '{type_name}' 下有 {count} 个物品，请输入这些物品的新类别：")
+            if not reassign_to:
+                return
         confirmation = messagebox.askyesno("确认删除", f"是否删除类别 '{type_name}'？")
         if confirmation:
-            ItemCategory.delete_category(type_name)
-            listbox.delete(selected[0])
+            def on_done(changed):
+                messagebox.showinfo("删除成功", f"物品类别 '{type_name}' 已删除，{changed} 个物品已重新归类。")
+
+            self.run_category_change(lambda: ItemCategory.delete_category(type_name, reassign_to), on_done)
 
     def modify_category(self, listbox):
         """修改物品类别"""
@@ -599,7 +2464,41 @@ class Application(tk.Tk):
         type_name = listbox.get(selected[0])
         new_attributes = simpledialog.askstring("修改类别", f"请输入类别 '{type_name}' 的新描述：")
         if new_attributes:
-            ItemCategory.modify_category(type_name, new_attributes)
+            try:
+                ItemCategory.modify_category(type_name, new_attributes, save=False)
+            except ValueError as e:
+                messagebox.showerror("错误", str(e))
+                return
+            self.save_category_changes([])
+            messagebox.showinfo("修改成功", f"物品类别 '{type_name}' 已修改。")
+
+    def rename_category(self, listbox):
+        """重命名物品类别，该类别下的物品同步改名"""
+        selected = listbox.curselection()
+        if not selected:
+            messagebox.showerror("错误", "请选择要重命名的类别。")
+            return
+        type_name = listbox.get(selected[0])
+        new_name = simpledialog.askstring("重命名类别", f"请输入类别 '{type_name}' 的新名称：")
+        if new_name:
+            def on_done(changed):
+                messagebox.showinfo("重命名成功", f"物品类别 '{type_name}' 已重命名为 '{new_name}'，{changed} 个物品已更新。")
+
+            self.run_category_change(lambda: ItemCategory.rename_category(type_name, new_name), on_done)
+
+    def merge_category(self, listbox):
+        """把选中的物品类别合并到另一个类别"""
+        selected = listbox.curselection()
+        if not selected:
+            messagebox.showerror("错误", "请选择要合并的类别。")
+            return
+        type_name = listbox.get(selected[0])
+        target = simpledialog.askstring("合并类别", f"请输入要把类别 '{type_name}' 合并到的类别名称：")
+        if target:
+            def on_done(changed):
+                messagebox.showinfo("合并成功", f"物品类别 '{type_name}' 已合并到 '{target}'，{changed} 个物品已重新归类。")
+
+            self.run_category_change(lambda: ItemCategory.merge_category(type_name, target), on_done)
 
     def add_item(self):
         """添加物品"""
@@ -643,60 +2542,173 @@ class Application(tk.Tk):
             messagebox.showerror("错误", "所有字段均为必填项。")
             return
 
-        Item.add_item(name, description, category, self.current_user)
-        messagebox.showinfo("成功", f"物品 '{name}' 添加成功。")
-        window.destroy()
+        def on_done(_):
+            messagebox.showinfo("成功", f"物品 '{name}' 添加成功。")
+            if window.winfo_exists():
+                window.destroy()
 
-    def modify_item(self):
-        """修改物品"""
-        modify_window = tk.Toplevel(self)
-        modify_window.title("修改物品")
-        modify_window.geometry("600x400")
+        owner = self.current_user
+        self.worker.submit(lambda task: Item.add_item(name, description, category, owner, wait=False),
+                           on_done=on_done, description="保存物品")
+
+    def my_items(self):
+        """显示我的物品面板"""
+        owner_id = self.current_user.user_id
+        # 加载期间发生的变化先缓存起来，窗口打开后再应用
+        pending_events = []
+        loading_view = self.ui_events.subscribe(pending_events.extend, ItemEvent)
+
+        def on_done(items):
+            self.ui_events.unsubscribe(loading_view)
+            self.open_my_items_window(items, pending_events)
+
+        def on_error(e):
+            self.ui_events.unsubscribe(loading_view)
+            messagebox.showerror("错误", f"加载我的物品失败：{e}")
+
+        self.worker.submit(lambda task: Item.items_of_owner(owner_id), on_done=on_done, on_error=on_error,
+                           description="加载我的物品", channel="search")
+
+    def open_my_items_window(self, items, pending_events=()):
+        """显示我的物品面板：按关键词筛选、分页显示，并可修改或删除选中的物品
+
+        物品列表和统计信息随物品变化实时更新，统计信息直接读取增量维护的计数。
+        """
+        owner_id = self.current_user.user_id
+        my_window = tk.Toplevel(self)
+        my_window.title("我的物品")
+        my_window.geometry("600x500")
+
+        tk.Label(my_window, text="我的物品", font=("Arial", 16)).pack(pady=10)
+
+        stats_label = tk.Label(my_window, justify="left", wraplength=550)
+        stats_label.pack(pady=5)
+
+        search_frame = tk.Frame(my_window)
+        search_frame.pack(pady=5)
+        tk.Label(search_frame, text="关键词:").pack(side="left")
+        keyword_var = tk.StringVar(my_window)
+        tk.Entry(search_frame, textvariable=keyword_var).pack(side="left", padx=5)
+
+        listbox = tk.Listbox(my_window, width=70, height=self.MY_ITEMS_PAGE_SIZE)
+        listbox.pack(pady=5)
+
+        page_frame = tk.Frame(my_window)
+        page_frame.pack(pady=5)
+        prev_button = tk.Button(page_frame, text="上一页")
+        prev_button.pack(side="left", padx=5)
+        page_label = tk.Label(page_frame)
+        page_label.pack(side="left", padx=5)
+        next_button = tk.Button(page_frame, text="下一页")
+        next_button.pack(side="left", padx=5)
+
+        # 物品ID -> 物品；当前筛选结果和页码
+        user_items = {item.item_id: item for item in items}
+        view = {"matches": [], "page": 0}
+
+        def refresh_stats():
+            with Item.lock:
+                total, by_category = ItemStats.of_owner(owner_id)
+            details = "，".join(f"{category} {count}" for category, count in sorted(by_category.items()))
+            stats_label.config(text=f"共 {total} 件物品" + (f"：{details}" if details else ""))
+
+        def show_page(page):
+            pages = max(1, -(-len(view["matches"]) // self.MY_ITEMS_PAGE_SIZE))
+            page = view["page"] = min(max(page, 0), pages - 1)
+            start = page * self.MY_ITEMS_PAGE_SIZE
+            listbox.delete(0, tk.END)
+            for item in view["matches"][start:start + self.MY_ITEMS_PAGE_SIZE]:
+                listbox.insert(tk.END, f"{item.name}（{item.category}）- {item.description}")
+            page_label.config(text=f"第 {page + 1}/{pages} 页，共 {len(view['matches'])} 件")
+            prev_button.config(state=tk.NORMAL if page > 0 else tk.DISABLED)
+            next_button.config(state=tk.NORMAL if page < pages - 1 else tk.DISABLED)
+
+        def refresh_list(page=0):
+            keyword = keyword_var.get().strip().lower()
+            view["matches"] = [item for item_id, item in sorted(user_items.items())
+                               if keyword in item.name.lower() or keyword in item.description.lower()]
+            show_page(page)
+
+        def selected_item():
+            selection = listbox.curselection()
+            if not selection:
+                messagebox.showerror("错误", "请先选择物品。", parent=my_window)
+                return None
+            return view["matches"][view["page"] * self.MY_ITEMS_PAGE_SIZE + selection[0]]
+
+        def modify_selected():
+            item = selected_item()
+            if item is not None:
+                self.open_modify_window(item)
+
+        def delete_selected():
+            item = selected_item()
+            if item is not None:
+                self.submit_delete_item(item)
+
+        def on_item_events(item_events):
+            changed = False
+            for event in item_events:
+                if event.item.owner.user_id != owner_id:
+                    continue
+                changed = True
+                if isinstance(event, ItemDeleted):
+                    user_items.pop(event.item.item_id, None)
+                else:
+                    user_items[event.item.item_id] = event.item
+            if changed:
+                refresh_stats()
+                refresh_list(view["page"])
 
-        user_items = [item for item in Item.items if item.owner.user_id == self.current_user.user_id]
-        if not user_items:
-            messagebox.showinfo("无物品", "您尚未添加任何物品。")
-            modify_window.destroy()
-            return
+        prev_button.config(command=lambda: show_page(view["page"] - 1))
+        next_button.config(command=lambda: show_page(view["page"] + 1))
+        keyword_var.trace_add("write", lambda *args: refresh_list())
 
-        tk.Label(modify_window, text="选择要修改的物品:").pack(pady=10)
+        buttons_frame = tk.Frame(my_window)
+        buttons_frame.pack(pady=10)
+        tk.Button(buttons_frame, text="修改所选物品", command=modify_selected).grid(row=0, column=0, padx=5)
+        tk.Button(buttons_frame, text="删除所选物品", command=delete_selected).grid(row=0, column=1, padx=5)
 
-        selected_item = tk.StringVar(modify_window)
-        selected_item.set(user_items[0].name)
+        refresh_stats()
+        refresh_list()
+        on_item_events(UIEventDispatcher.coalesce(pending_events))
+        self.ui_events.subscribe(on_item_events, ItemEvent, window=my_window)
 
-        item_menu = tk.OptionMenu(modify_window, selected_item, *[item.name for item in user_items])
-        item_menu.pack(pady=5)
+    def open_modify_window(self, item):
+        """显示修改物品窗口"""
+        modify_window = tk.Toplevel(self)
+        modify_window.title("修改物品")
+        modify_window.geometry("400x250")
 
         tk.Label(modify_window, text="新物品名称:").pack(pady=5)
         new_name_entry = tk.Entry(modify_window)
+        new_name_entry.insert(0, item.name)
         new_name_entry.pack(pady=5)
 
         tk.Label(modify_window, text="新物品描述:").pack(pady=5)
         new_description_entry = tk.Entry(modify_window)
+        new_description_entry.insert(0, item.description)
         new_description_entry.pack(pady=5)
 
         submit_button = tk.Button(modify_window, text="修改",
-                                  command=lambda: self.submit_modify_item(modify_window, selected_item.get(),
+                                  command=lambda: self.submit_modify_item(modify_window, item,
                                                                         new_name_entry.get(),
                                                                         new_description_entry.get()))
         submit_button.pack(pady=20)
 
-    def submit_modify_item(self, window, old_name, new_name, new_description):
+    def submit_modify_item(self, window, item, new_name, new_description):
         """提交修改物品信息"""
         if not all([new_name, new_description]):
             messagebox.showerror("错误", "所有字段均为必填项。")
             return
 
-        # 找到对应的物品
-        item = next((item for item in Item.items if item.name == old_name and item.owner.user_id == self.current_user.user_id), None)
-        if item:
-            item.name = new_name
-            item.description = new_description
-            Item.save_items()
-            messagebox.showinfo("成功", f"物品 '{old_name}' 已修改为 '{new_name}'。")
-            window.destroy()
-        else:
-            messagebox.showerror("错误", "未找到指定物品。")
+        def on_done(result):
+            messagebox.showinfo("修改结果", result)
+            if window.winfo_exists():
+                window.destroy()
+
+        self.worker.submit(lambda task: Item.modify_item(item, new_name, new_description, wait=False),
+                           on_done=on_done, description="保存物品")
 
     def search_item(self):
         """搜索物品"""
@@ -728,86 +2740,25 @@ class Application(tk.Tk):
             messagebox.showerror("错误", "关键词不能为空。")
             return
 
-        results = Item.search_item(category, keyword)
-        if results:
-            result_text = "\n\n".join([f"名称: {item.name}\n描述: {item.description}\n所有者: {item.owner.name}" for item in results])
-            messagebox.showinfo("搜索结果", result_text)
-        else:
-            messagebox.showinfo("无结果", "未找到符合条件的物品。")
-        window.destroy()
-
-    def delete_item(self):
-        """删除物品"""
-        delete_window = tk.Toplevel(self)
-        delete_window.title("删除物品")
-        delete_window.geometry("400x300")
-
-        user_items = [item for item in Item.items if item.owner.user_id == self.current_user.user_id]
-        if not user_items:
-            messagebox.showinfo("无物品", "您尚未添加任何物品。")
-            delete_window.destroy()
-            return
-
-        tk.Label(delete_window, text="选择要删除的物品:").pack(pady=10)
-
-        selected_item = tk.StringVar(delete_window)
-        selected_item.set(user_items[0].name)
-
-        item_menu = tk.OptionMenu(delete_window, selected_item, *[item.name for item in user_items])
-        item_menu.pack(pady=5)
-
-        submit_button = tk.Button(delete_window, text="删除",
-                                  command=lambda: self.submit_delete_item(delete_window, selected_item.get()))
-        submit_button.pack(pady=20)
-
-    def submit_delete_item(self, window, item_name):
-        """提交删除物品信息"""
-        item = next((item for item in Item.items if item.name == item_name and item.owner.user_id == self.current_user.user_id), None)
-        if item:
-            confirmation = messagebox.askyesno("确认删除", f"是否删除物品 '{item.name}'？")
-            if confirmation:
-                result = Item.delete_item(item)
-                messagebox.showinfo("删除结果", result)
+        def on_done(results):
+            if results:
+                result_text = "\n\n".join([f"名称: {item.name}\n描述: {item.description}\n所有者: {item.owner.name}" for item in results])
+                messagebox.showinfo("搜索结果", result_text)
+            else:
+                messagebox.showinfo("无结果", "未找到符合条件的物品。")
+            if window.winfo_exists():
                 window.destroy()
-        else:
-            messagebox.showerror("错误", "未找到指定物品。")
-
-    def view_all_items(self):
-        """显示全部物品列表"""
-        if not isinstance(self.current_user, Admin):
-            messagebox.showerror("权限不足", "只有管理员才能查看全部物品。")
-            return
-
-        view_window = tk.Toplevel(self)
-        view_window.title("全部物品列表")
-        view_window.geometry("700x500")
-
-        tk.Label(view_window, text="全部物品列表", font=("Arial", 16)).pack(pady=10)
-
-        canvas = tk.Canvas(view_window)
-        scrollbar = tk.Scrollbar(view_window, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas)
-
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-
-        canvas.configure(yscrollcommand=scrollbar.set)
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # 搜索在后台执行，可以通过状态栏的取消按钮中止
+        self.worker.submit(lambda task: Item.search_item(category, keyword, task=task),
+                           on_done=on_done, description="搜索物品", channel="search", cancellable=True)
 
-        for item in Item.items:
-            frame = tk.Frame(scrollable_frame, borderwidth=1, relief="solid", padx=10, pady=10)
-            frame.pack(padx=10, pady=5, fill="x")
-
-            info = f"名称: {item.name}\n描述: {item.description}\n类别: {item.category}\n所有者: {item.owner.name}"
-            tk.Label(frame, text=info, justify="left").pack(side="left")
+    def submit_delete_item(self, item):
+        """确认后删除物品"""
+        if messagebox.askyesno("确认删除", f"是否删除物品 '{item.name}'？"):
+            self.worker.submit(lambda task: Item.delete_item(item, wait=False),
+                               on_done=lambda result: messagebox.showinfo("删除结果", result),
+                               description="删除物品")
 
     def reset_user_password(self):
         """管理员重置用户密码"""
@@ -851,7 +2802,7 @@ class Application(tk.Tk):
             confirmation = messagebox.askyesno("确认重置", f"是否将用户 '{user.name}' 的密码重置为 '{new_password}'？")
             if confirmation:
                 result = self.current_user.reset_user_password(user, new_password)
-                self.save_all_users()
+                self.save_all_users_async()
                 messagebox.showinfo("重置成功", result)
                 window.destroy()
         else:
@@ -863,51 +2814,184 @@ class Application(tk.Tk):
             messagebox.showerror("权限不足", "只有管理员才能查看全部物品。")
             return
 
+        # 加载期间发生的变化先缓存起来，窗口打开后再应用
+        pending_events = []
+        loading_view = self.ui_events.subscribe(pending_events.extend, ItemEvent)
+
+        def on_done(items):
+            self.ui_events.unsubscribe(loading_view)
+            self.open_all_items_window(items, pending_events)
+
+        def on_error(e):
+            self.ui_events.unsubscribe(loading_view)
+            messagebox.showerror("错误", f"加载全部物品失败：{e}")
+
+        self.worker.submit(lambda task: Item.all_items(), on_done=on_done, on_error=on_error,
+                           description="加载全部物品", channel="search")
+
+    def open_all_items_window(self, items, pending_events=()):
+        """显示全部物品列表窗口，分页显示，物品变化时只刷新当前页"""
         view_window = tk.Toplevel(self)
         view_window.title("全部物品列表")
         view_window.geometry("700x500")
 
         tk.Label(view_window, text="全部物品列表", font=("Arial", 16)).pack(pady=10)
 
-        canvas = tk.Canvas(view_window)
-        scrollbar = tk.Scrollbar(view_window, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas)
-
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
+        tree = ttk.Treeview(view_window, columns=("name", "description", "category", "owner"),
+                            show="headings", height=self.ALL_ITEMS_PAGE_SIZE)
+        for column, text in (("name", "名称"), ("description", "描述"), ("category", "类别"), ("owner", "所有者")):
+            tree.heading(column, text=text)
+        tree.pack(padx=10, fill="both", expand=True)
+
+        page_frame = tk.Frame(view_window)
+        page_frame.pack(pady=5)
+        prev_button = tk.Button(page_frame, text="上一页")
+        prev_button.pack(side="left", padx=5)
+        page_label = tk.Label(page_frame)
+        page_label.pack(side="left", padx=5)
+        next_button = tk.Button(page_frame, text="下一页")
+        next_button.pack(side="left", padx=5)
+
+        # 物品ID -> 物品，按加载和新增的顺序排列；ids 在增删物品后才重新生成
+        all_items = {item.item_id: item for item in items}
+        view = {"ids": None, "page": 0}
+
+        def show_page(page):
+            if view["ids"] is None:
+                view["ids"] = list(all_items)
+            ids = view["ids"]
+            pages = max(1, -(-len(ids) // self.ALL_ITEMS_PAGE_SIZE))
+            page = view["page"] = min(max(page, 0), pages - 1)
+            start = page * self.ALL_ITEMS_PAGE_SIZE
+            tree.delete(*tree.get_children())
+            for item_id in ids[start:start + self.ALL_ITEMS_PAGE_SIZE]:
+                item = all_items[item_id]
+                tree.insert("", tk.END, values=(item.name, item.description, item.category, item.owner.name))
+            page_label.config(text=f"第 {page + 1}/{pages} 页，共 {len(ids)} 件")
+            prev_button.config(state=tk.NORMAL if page > 0 else tk.DISABLED)
+            next_button.config(state=tk.NORMAL if page < pages - 1 else tk.DISABLED)
+
+        def on_item_events(item_events):
+            if not item_events:
+                return
+            for event in item_events:
+                if isinstance(event, ItemDeleted):
+                    if all_items.pop(event.item.item_id, None) is not None:
+                        view["ids"] = None
+                else:
+                    if event.item.item_id not in all_items:
+                        view["ids"] = None
+                    all_items[event.item.item_id] = event.item
+            show_page(view["page"])
 
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        prev_button.config(command=lambda: show_page(view["page"] - 1))
+        next_button.config(command=lambda: show_page(view["page"] + 1))
 
-        canvas.configure(yscrollcommand=scrollbar.set)
+        show_page(0)
+        on_item_events(UIEventDispatcher.coalesce(pending_events))
+        self.ui_events.subscribe(on_item_events, ItemEvent, window=view_window)
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+    def open_dashboard(self):
+        """显示统计面板：各类别物品数量、物品最多的用户、待审核用户数量和注册速度
 
-        for item in Item.items:
-            frame = tk.Frame(scrollable_frame, borderwidth=1, relief="solid", padx=10, pady=10)
-            frame.pack(padx=10, pady=5, fill="x")
+        数据直接读取增量维护的计数，打开和刷新面板都不会遍历物品或用户；
+        物品、类别和用户变化时每帧最多刷新一次。
+        """
+        if not isinstance(self.current_user, Admin):
+            messagebox.showerror("权限不足", "只有管理员才能查看统计面板。")
+            return
 
-            info = f"名称: {item.name}\n描述: {item.description}\n类别: {item.category}\n所有者: {item.owner.name}"
-            tk.Label(frame, text=info, justify="left").pack(side="left")
+        dashboard_window = tk.Toplevel(self)
+        dashboard_window.title("统计面板")
+        dashboard_window.geometry("600x600")
+
+        tk.Label(dashboard_window, text="统计面板", font=("Arial", 16)).pack(pady=10)
+
+        summary_label = tk.Label(dashboard_window, justify="left")
+        summary_label.pack(pady=5)
+
+        tk.Label(dashboard_window, text="各类别物品数量").pack(pady=5)
+        category_tree = ttk.Treeview(dashboard_window, columns=("category", "count"), show="headings", height=8)
+        category_tree.heading("category", text="类别")
+        category_tree.heading("count", text="物品数量")
+        category_tree.pack(padx=10, fill="x")
+
+        tk.Label(dashboard_window, text=f"物品最多的 {self.DASHBOARD_TOP_OWNERS} 个用户").pack(pady=5)
+        owner_tree = ttk.Treeview(dashboard_window, columns=("owner", "count"), show="headings", height=8)
+        owner_tree.heading("owner", text="用户")
+        owner_tree.heading("count", text="物品数量")
+        owner_tree.pack(padx=10, fill="x")
+
+        def refresh(_events=()):
+            with Item.lock:
+                by_category = dict(ItemStats.by_category)
+                top_owners = ItemStats.top_owners(self.DASHBOARD_TOP_OWNERS)
+                categories = list(ItemCategory.categories)
+            # 没有物品的类别也显示出来，不属于任何已定义类别的物品排在后面
+            categories += sorted(category for category in by_category if category not in ItemCategory.categories)
+            week = UserStats.registrations(7)
+            summary_label.config(text=f"物品总数: {sum(by_category.values())}    类别数量: {len(ItemCategory.categories)}\n"
+                                      f"用户总数: {UserStats.total}    待审核用户: {UserStats.pending}\n"
+                                      f"今日注册: {UserStats.registrations(1)}    "
+                                      f"近 7 天注册: {week}（平均每天 {week / 7:.1f} 人）")
+            category_tree.delete(*category_tree.get_children())
+            for category in categories:
+                category_tree.insert("", tk.END, values=(category, by_category.get(category, 0)))
+            owner_tree.delete(*owner_tree.get_children())
+            for owner_id, total in top_owners:
+                owner = self.users.get(owner_id)
+                owner_tree.insert("", tk.END, values=(f"{owner.name}（{owner_id}）" if owner else owner_id, total))
+
+        refresh()
+        self.ui_events.subscribe(refresh, ItemEvent, CategoryChanged, UserEvent, window=dashboard_window)
 
     def save_all_users(self):
         """保存所有用户信息到文件"""
-        with open("users_info.txt", "w", encoding='utf-8') as f:
-            for user in self.users.values():
-                f.write(json.dumps(user.register(), ensure_ascii=False) + "\n")
+        User.save_users([user.register() for user in self.users.values()])
+
+    def save_all_users_async(self):
+        """在主线程复制用户列表，由后台线程生成用户信息并写入文件"""
+        users = list(self.users.values())
+        self.worker.submit(lambda task: User.save_users([user.register() for user in users]),
+                           description="保存用户信息")
 
     def on_closing(self):
         """在关闭应用时保存所有用户信息和物品信息"""
-        self.save_all_users()
-        Item.save_items()
+        # 取消搜索等可取消的任务，并等待已提交的写操作完成
+        self.worker.shutdown()
+        self.ui_events.shutdown()
+        Item.shutdown_search_pool()
+        # 数据尚未加载完成时不能保存，否则会用空数据覆盖文件
+        if self.data_loaded:
+            self.save_all_users()
+            Item.save_items()
+        Item.close_wal()
         self.destroy()
 
-# 5. 主程序
+# 7. 主程序
 if __name__ == "__main__":
+    # python Item_resurrected.py --migrate-shards 把 items.txt 拆分为按类别分片的数据目录
+    if "--migrate-shards" in sys.argv:
+        if ShardedItemStore.exists(Item.SHARD_DIR):
+            sys.exit(f"分片目录 {Item.SHARD_DIR} 已存在。")
+        # 先把预写日志中已确认的修改合并到 items.txt，否则拆分后这些修改会丢失
+        if WriteAheadLog.read(Item.WAL_PATH):
+            Item.load_items(User.load_users())
+            Item.save_items()
+            Item.close_wal()
+        count = ShardedItemStore.migrate("items.txt", Item.SHARD_DIR)
+        print(f"已把 items.txt 拆分为 {count} 个分片，保存在 {Item.SHARD_DIR} 目录中。")
+        sys.exit(0)
+
+    # python Item_resurrected.py --dedup-report 列出 users_info.txt 中邮箱或电话重复的用户
+    if "--dedup-report" in sys.argv:
+        duplicates = User.find_duplicates()
+        for field, label in (("email", "邮箱"), ("phone", "电话")):
+            print(f"重复的{label}: {len(duplicates[field])} 个")
+            for key, user_ids in duplicates[field].items():
+                print(f"  {key}: 用户ID {', '.join(str(user_id) for user_id in user_ids)}")
+        sys.exit(0)
+
     app = Application()
     app.protocol("WM_DELETE_WINDOW", app.on_closing)  # 确保关闭时保存数据
     app.mainloop()
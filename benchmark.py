@@ -0,0 +1,139 @@
+"""
+File Name: benchmark.py
+Description: 性能测试脚本，不需要图形界面，也不会读写程序的数据文件。
+    python benchmark.py search [物品数量]
+        比较顺序搜索和不同进程数的并行搜索的耗时
+    python benchmark.py codec [记录数量]
+        比较逐行 json 读写和 JsonLinesCodec 各后端批量写入、分块读取的吞吐量
+"""
+import os
+import sys
+import time
+import json
+import random
+import tempfile
+
+from Item_resurrected import Item, JsonLinesCodec, SearchSnapshot, User
+
+WORDS = ["lining", "basketball", "phone", "jacket", "bicycle", "lamp", "desk", "chair",
+         "十大", "书包", "台灯", "自行车", "篮球", "手机", "旧书", "雨伞"]
+CATEGORIES = ["运动", "电子", "家具", "书籍", "服装", "其他"]
+
+
+def make_items(count, seed=0):
+    """生成 count 个随机物品并放入 Item.items"""
+    rng = random.Random(seed)
+    owners = [User(f"user{i}", "address", "13800000000", f"user{i}@example.com") for i in range(100)]
+    Item.owners = {owner.user_id: owner for owner in owners}
+    for _ in range(count):
+        name = " ".join(rng.choice(WORDS) for _ in range(2))
+        description = " ".join(rng.choice(WORDS) for _ in range(8)) + f" {rng.randint(0, 10 ** 6)}"
+        Item._register(Item(name, description, rng.choice(CATEGORIES), rng.choice(owners)))
+
+
+def timed(func, repeat=3):
+    """返回 func 多次运行中最短的耗时（秒）和最后一次的结果"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def edit_random_item(rng):
+    """修改一个随机物品的描述，与 Item.modify_item 一样记录变化，但不写数据文件"""
+    with Item.lock:
+        item = Item.items[rng.randrange(len(Item.items))]
+        item.description += " 4217"
+        Item._mark_changed(item.item_id)
+
+
+def bench_search(count):
+    """比较顺序搜索和 1 到 CPU 核数个进程的并行搜索
+
+    并行搜索分别测量快照不变时的耗时，以及每次搜索前修改一个物品时的耗时
+    （变化增量应用到快照，不重新建立）；另外单独报告完整建立一次快照的耗时。
+    """
+    make_items(count)
+    # 每次都用相同的条件搜索，关闭结果缓存才能测到真实的扫描耗时
+    Item.search_cache = None
+    # 任意子串查询，无法利用索引
+    category, keyword = "", "4217"
+    rng = random.Random(1)
+    print(f"物品数量: {count}，CPU 核数: {os.cpu_count()}")
+
+    build, snapshot = timed(lambda: SearchSnapshot(list(Item.items)), repeat=1)
+    snapshot.close()
+    print(f"建立共享内存快照: {build:.3f} 秒")
+
+    serial, expected = timed(lambda: Item.search_item(category, keyword, parallel=False))
+    print(f"{'方式':<12}{'耗时(秒)':>10}{'加速比':>10}{'修改后(秒)':>12}{'加速比':>10}")
+    print(f"{'顺序':<12}{serial:>10.3f}{1.0:>10.2f}{serial:>12.3f}{1.0:>10.2f}")
+
+    processes = 1
+    while processes <= (os.cpu_count() or 1):
+        Item.shutdown_search_pool()
+        Item.SEARCH_PROCESSES = processes
+        # 第一次调用会启动进程池并建立共享内存快照，不计入耗时
+        timed(lambda: Item.search_item(category, keyword, parallel=True), repeat=1)
+        elapsed, result = timed(lambda: Item.search_item(category, keyword, parallel=True))
+        assert [item.item_id for item in result] == [item.item_id for item in expected]
+
+        def edit_and_search():
+            edit_random_item(rng)
+            return Item.search_item(category, keyword, parallel=True)
+
+        edited, result = timed(edit_and_search)
+        expected = Item.search_item(category, keyword, parallel=False)
+        # 补丁中的物品排在快照扫描结果之后，只比较集合
+        assert sorted(item.item_id for item in result) == sorted(item.item_id for item in expected)
+        print(f"{f'{processes} 个进程':<12}{elapsed:>10.3f}{serial / elapsed:>10.2f}"
+              f"{edited:>12.3f}{serial / edited:>10.2f}")
+        processes *= 2
+    Item.shutdown_search_pool()
+
+
+def bench_codec(count):
+    """比较逐行 json 读写与 JsonLinesCodec 各后端的写入和读取速度"""
+    make_items(count)
+    records = [Item._to_record(item) for item in Item.all_items()]
+    print(f"记录数量: {count}，可用后端: {', '.join(JsonLinesCodec.available_backends())}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "items.txt")
+
+        def write_per_line():
+            with open(path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        def read_per_line():
+            with open(path, "r", encoding="utf-8") as f:
+                return [json.loads(line.strip()) for line in f if line.strip()]
+
+        print(f"{'方式':<16}{'写入(条/秒)':>14}{'读取(条/秒)':>14}{'文件(MB)':>10}")
+        cases = [("逐行 json", write_per_line, read_per_line)]
+        for backend in JsonLinesCodec.available_backends():
+            backend_codec = JsonLinesCodec(backend)
+            cases.append((f"codec {backend}", lambda c=backend_codec: c.write(path, records),
+                          lambda c=backend_codec: c.read(path)))
+        for label, write, read in cases:
+            write_time, _ = timed(write)
+            read_time, result = timed(read)
+            assert len(result) == count
+            size = os.path.getsize(path) / (1 << 20)
+            print(f"{label:<16}{count / write_time:>14,.0f}{count / read_time:>14,.0f}{size:>10.1f}")
+
+
+BENCHMARKS = {
+    "search": (bench_search, 1000000),
+    "codec": (bench_codec, 1000000),
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        sys.exit(f"用法: python benchmark.py {{{'|'.join(BENCHMARKS)}}} [数量]")
+    bench, default_count = BENCHMARKS[sys.argv[1]]
+    bench(int(sys.argv[2]) if len(sys.argv) > 2 else default_count)